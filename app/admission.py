@@ -0,0 +1,149 @@
+"""
+Admission control for expensive /ask work (retrieval + generation).
+
+A request runs when both a global slot and a slot for its website are free.
+Otherwise it waits in a bounded queue, but only if its estimated wait (queue
+position x average service time / slots) fits within `max_wait_seconds`;
+requests that could not be served in time are rejected immediately with a
+Retry-After hint instead of tying up a server thread until the proxy times out:
+
+- 429 when one website exceeds its own limit + queue,
+- 503 when the whole worker is saturated.
+
+Fast-path answers and callers joining an identical in-flight question never
+take a slot. Limits are per worker process.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from app.config import config
+from app.logger import get_logger
+from app.metrics import ADMISSION, span
+
+logger = get_logger("admission")
+
+EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, per_website: int, queue_size: int,
+                 per_website_queue: int, max_wait: float):
+        self.max_concurrent = max_concurrent
+        self.per_website = per_website
+        self.queue_size = queue_size
+        self.per_website_queue = per_website_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self._site_running: Dict[str, int] = {}
+        self._site_waiting: Dict[str, int] = {}
+        self.service_seconds = 2.0  # EWMA of slot hold time; seeded with a typical RAG answer
+
+    def _can_run(self, website: str) -> bool:
+        return self.running < self.max_concurrent and self._site_running.get(website, 0) < self.per_website
+
+    def _estimated_wait(self, website: str) -> float:
+        """Rough wait for a request joining the queue now."""
+        global_ahead = self.waiting + max(0, self.running - self.max_concurrent + 1)
+        site_ahead = self._site_waiting.get(website, 0) + max(
+            0, self._site_running.get(website, 0) - self.per_website + 1
+        )
+        return self.service_seconds * max(
+            global_ahead / self.max_concurrent, site_ahead / self.per_website
+        )
+
+    def _reject(self, status_code: int, reason: str, retry_after: float):
+        ADMISSION.inc(result=f"rejected_{reason}")
+        raise Rejected(status_code, reason, retry_after)
+
+    def _take(self, website: str):
+        self.running += 1
+        self._site_running[website] = self._site_running.get(website, 0) + 1
+
+    def acquire(self, website: str):
+        """Block until admitted or raise `Rejected`; pair with `release`."""
+        with self._cond:
+            if self._can_run(website):
+                self._take(website)
+                ADMISSION.inc(result="admitted")
+                return
+
+            estimate = self._estimated_wait(website)
+            if self._site_waiting.get(website, 0) >= self.per_website_queue:
+                self._reject(429, "website_queue_full", estimate)
+            if self.waiting >= self.queue_size:
+                self._reject(503, "queue_full", estimate)
+            if estimate > self.max_wait:
+                self._reject(503 if self.running >= self.max_concurrent else 429, "deadline", estimate)
+
+            deadline = time.monotonic() + self.max_wait
+            self.waiting += 1
+            self._site_waiting[website] = self._site_waiting.get(website, 0) + 1
+            try:
+                while not self._can_run(website):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(503 if self.running >= self.max_concurrent else 429,
+                                     "timeout", self._estimated_wait(website))
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                self._site_waiting[website] -= 1
+                if not self._site_waiting[website]:
+                    del self._site_waiting[website]
+            self._take(website)
+            ADMISSION.inc(result="queued")
+
+    def release(self, website: str, held_seconds: float):
+        with self._cond:
+            self.running -= 1
+            self._site_running[website] -= 1
+            if not self._site_running[website]:
+                del self._site_running[website]
+            self.service_seconds += EWMA_ALPHA * (held_seconds - self.service_seconds)
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, website: str) -> Iterator[None]:
+        with span("ask.admission"):
+            self.acquire(website)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(website, time.monotonic() - start)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "running": self.running,
+                "waiting": self.waiting,
+                "maxConcurrent": self.max_concurrent,
+                "perWebsite": self.per_website,
+                "avgServiceMs": round(self.service_seconds * 1000, 1),
+                "busiestWebsites": dict(
+                    sorted(self._site_running.items(), key=lambda kv: -kv[1])[:5]
+                ),
+            }
+
+
+admission = AdmissionController(
+    max_concurrent=config.ADMISSION_MAX_CONCURRENT,
+    per_website=config.ADMISSION_PER_WEBSITE,
+    queue_size=config.ADMISSION_QUEUE_SIZE,
+    per_website_queue=config.ADMISSION_PER_WEBSITE_QUEUE,
+    max_wait=config.ADMISSION_MAX_WAIT,
+)
@@ -1,81 +1,101 @@
-import json
-from openai import OpenAI
-from app.config import config
+from app.context_builder import build_context, count_tokens, score_from_additional
+from app.intents import route
 from app.logger import get_logger
-from app.weaviate_client import get_client
+from app.menu_index import get_menu_index, menu_context
+from app.metrics import span
+from app.model_router import generate
+from app.openai_client import get_openai
+from app.vectorizer import embed
+from app.weaviate_client import guarded
 
 logger = get_logger("chatbot")
-client_oa = OpenAI(api_key=config.OPENAI_API_KEY)
+# Last good profile per website, served while Weaviate is unreachable
+_profile_cache: dict[str, dict] = {}
 
 
+@span("profile.fetch")
 def _fetch_profile_facts(website: str) -> dict:
     """
-    Fetch stored BusinessProfile facts from Weaviate.
+    Fetch stored BusinessProfile facts from Weaviate
+    (falls back to the last fetched copy if Weaviate is down).
     """
-    client = get_client()
     try:
-        result = client.query.get(
-            "BusinessProfile",
-            [
-                "name", "telephone", "email", "address",
-                "openingHours", "menuUrls", "menuItems",
-                "priceRange", "cuisines", "social", "vertical"
-            ]
-        ).with_where({
-            "path": ["website"],
-            "operator": "Equal",
-            "valueText": website
-        }).with_limit(1).do()
+        with guarded() as client:
+            result = client.query.get(
+                "BusinessProfile",
+                [
+                    "name", "telephone", "email", "address",
+                    "openingHours", "menuUrls", "menuItems",
+                    "priceRange", "cuisines", "social", "vertical"
+                ]
+            ).with_where({
+                "path": ["website"],
+                "operator": "Equal",
+                "valueText": website
+            }).with_limit(1).do()
 
         items = result.get("data", {}).get("Get", {}).get("BusinessProfile", [])
-        return items[0] if items else {}
+        profile = _profile_cache[website] = items[0] if items else {}
+        return profile
     except Exception as e:
-        logger.warning(f"Profile fetch failed: {e}")
+        if website in _profile_cache:
+            logger.warning("Profile fetch failed, serving cached profile: %s", e)
+            return _profile_cache[website]
+        logger.warning("Profile fetch failed: %s", e)
         return {}
 
 
-def ask(question: str, website: str) -> str:
-    profile = _fetch_profile_facts(website)
+def fast_answer(question: str, website: str) -> str | None:
+    """
+    Answer fact questions (hours, contact, menu, ...) straight from the
+    BusinessProfile; returns None when the question needs retrieval + LLM.
+    """
+    return route(question, website, lambda: _fetch_profile_facts(website))
+
 
-    # If Q matches a fact directly
-    q_lower = question.lower()
-    if "phone" in q_lower or "call" in q_lower:
-        if profile.get("telephone"):
-            return f"The phone number is {profile['telephone']}"
-    if "email" in q_lower:
-        if profile.get("email"):
-            return f"The email address is {profile['email']}"
-    if "address" in q_lower or "where" in q_lower:
-        if profile.get("address"):
-            return f"The address is {profile['address']}"
-    if "menu" in q_lower:
-        if profile.get("menuUrls"):
-            return f"Menu: {', '.join(profile['menuUrls'])}"
+def menu_lines(question: str, website: str) -> str:
+    """Menu items relevant to the question, as compact LLM context ("" if none)."""
+    index = get_menu_index(website, lambda: _fetch_profile_facts(website).get("menuItems"))
+    return menu_context(question, index)
+
+
+def ask(question: str, website: str) -> str:
+    answer = fast_answer(question, website)
+    if answer:
+        return answer
 
     # Otherwise do vector search
-    client = get_client()
     try:
-        emb = client_oa.embeddings.create(
-            input=question,
-            model=config.LLM_EMBEDDING_MODEL
-        ).data[0].embedding
+        emb = embed(question)
 
-        res = client.query.get(
-            "WebContent",
-            ["text", "source", "title"]
-        ).with_near_vector({"vector": emb, "certainty": 0.7}) \
-            .with_where({"path": ["website"], "operator": "Equal", "valueText": website}) \
-            .with_limit(4).do()
+        with span("ask.retrieve"), guarded() as client:
+            res = client.query.get(
+                "WebContent",
+                ["text", "source", "title", "hash", "_additional { distance }"]
+            ).with_near_vector({"vector": emb, "certainty": 0.7}) \
+                .with_where({"path": ["website"], "operator": "Equal", "valueText": website}) \
+                .with_limit(6).do()
 
         docs = res.get("data", {}).get("Get", {}).get("WebContent", [])
-        context = "\n\n".join(f"{d.get('title') or ''}\n{d['text']}" for d in docs)
+        passages = [
+            {"text": f"{d.get('title') or ''}\n{d['text']}", "score": score_from_additional(d), "hash": d.get("hash")}
+            for d in docs
+        ]
+        # Tier routing reflects retrieval quality only, not the always-relevant menu lines
+        best_score = max((p["score"] for p in passages), default=0.0)
+        menu = menu_lines(question, website)
+        if menu:
+            passages.append({"text": menu, "score": 1.0})
+        context = build_context(question, passages)
 
         prompt = f"Answer the question based on the context below.\n\nContext:\n{context}\n\nQ: {question}\nA:"
-        resp = client_oa.chat.completions.create(
-            model=config.LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
+        return generate(
+            get_openai(),
+            [{"role": "user", "content": prompt}],
+            question,
+            best_score=best_score,
+            context_tokens=count_tokens(context),
         )
-        return resp.choices[0].message.content.strip()
     except Exception as e:
-        logger.error(f"Vector Q failed: {e}")
+        logger.error("Vector Q failed: %s", e)
         return "Sorry, I couldn't find an answer."
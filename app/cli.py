@@ -0,0 +1,201 @@
+"""
+Operational commands.
+
+    python -m app.cli ensure-schema
+    python -m app.cli migrate-embeddings --dump-dir ./migration [--dry-run] [--resume]
+    python -m app.cli embedding-report --website https://example.com --questions questions.txt
+    python -m app.cli export-site --website https://example.com --out example.snap
+    python -m app.cli import-site example.snap [--replace]
+    python -m app.cli teach-import qa.csv --website https://example.com
+    python -m app.cli teach-delete questions.jsonl --website https://example.com [--all]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from app.logger import correlation, get_logger, new_correlation_id
+
+logger = get_logger("cli")
+
+
+def cmd_ensure_schema(args) -> int:
+    from app.weaviate_client import ensure_webcontent_schema, health
+
+    if not health.check():
+        logger.error("Weaviate is not ready: %s", health.last_error)
+        return 1
+    return 0 if ensure_webcontent_schema() else 1
+
+
+def cmd_migrate_embeddings(args) -> int:
+    from app.embedding_migration import MigrationError, migrate_embeddings
+
+    try:
+        reports = migrate_embeddings(
+            classes=args.classes, dump_dir=args.dump_dir, batch_size=args.batch_size,
+            resume=args.resume, dry_run=args.dry_run,
+        )
+    except MigrationError as e:
+        logger.error(str(e))
+        return 1
+    print(json.dumps(reports, indent=2))
+    return 0 if args.dry_run or all(r["written"] == r["objectsAfter"] for r in reports) else 1
+
+
+def cmd_embedding_report(args) -> int:
+    from app.embedding_report import build_report, format_report
+
+    questions = []
+    if args.questions:
+        questions = [q.strip() for q in args.questions.read_text(encoding="utf-8").splitlines() if q.strip()]
+    try:
+        report = build_report(args.website, questions, args.dims, k=args.k, max_chunks=args.max_chunks)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    print(format_report(report))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+def cmd_export_site(args) -> int:
+    from app.snapshot import SnapshotError, export_site
+
+    try:
+        counts = export_site(args.website, args.out)
+    except SnapshotError as e:
+        logger.error(str(e))
+        return 1
+    print(json.dumps({"file": str(args.out), "bytes": args.out.stat().st_size, "objects": counts}, indent=2))
+    return 0
+
+
+def cmd_import_site(args) -> int:
+    from app.snapshot import SnapshotError, import_site
+
+    try:
+        report = import_site(args.file, replace=args.replace, batch_size=args.batch_size)
+    except (OSError, SnapshotError) as e:
+        logger.error(str(e))
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0 if not any(c["failed"] for c in report["classes"].values()) else 1
+
+
+def _read_teach_rows(args):
+    from app.teach import detect_format, parse_rows
+
+    text = args.file.read_text(encoding="utf-8-sig")
+    return parse_rows(text, args.format or detect_format(name=args.file.name))
+
+
+def _teach_report(report: dict, errors: list) -> int:
+    report["rows"] += len(errors)
+    report["failed"] = sorted(errors + report["failed"], key=lambda f: f["row"] or 0)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if not report["failed"] else 1
+
+
+def cmd_teach_import(args) -> int:
+    from app.teach import TeachError, bulk_teach
+
+    try:
+        rows, errors = _read_teach_rows(args)
+    except (OSError, TeachError) as e:
+        logger.error(str(e))
+        return 1
+    return _teach_report(bulk_teach(rows, args.website, batch_size=args.batch_size), errors)
+
+
+def cmd_teach_delete(args) -> int:
+    from app.teach import TeachError, bulk_delete, delete_website
+
+    if args.all:
+        if not args.website:
+            logger.error("--all needs --website")
+            return 1
+        print(json.dumps({"deleted": delete_website(args.website)}, indent=2))
+        return 0
+    if not args.file:
+        logger.error("Pass a file of questions to delete, or --all")
+        return 1
+    try:
+        rows, errors = _read_teach_rows(args)
+    except (OSError, TeachError) as e:
+        logger.error(str(e))
+        return 1
+    return _teach_report(bulk_delete(rows, args.website), errors)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Chatbot maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ensure-schema", help="create missing Weaviate classes (run once per deployment)")
+    p.set_defaults(func=cmd_ensure_schema)
+
+    p = sub.add_parser(
+        "migrate-embeddings",
+        help="re-embed WebContent/CustomQA with the configured embedding size and compression",
+    )
+    p.add_argument("--classes", nargs="+", default=["WebContent", "CustomQA"], choices=["WebContent", "CustomQA"])
+    p.add_argument("--dump-dir", type=Path, default=Path("migration"), help="where object dumps are kept")
+    p.add_argument("--batch-size", type=int, default=100, help="objects per embeddings request / batch write")
+    p.add_argument("--resume", action="store_true", help="rebuild from an existing dump instead of re-dumping")
+    p.add_argument("--dry-run", action="store_true", help="only show object counts and stored vs. target size")
+    p.set_defaults(func=cmd_migrate_embeddings)
+
+    p = sub.add_parser("embedding-report", help="recall vs. memory for embedding sizes and compression")
+    p.add_argument("--website", required=True)
+    p.add_argument("--questions", type=Path, help="sample questions, one per line (default: taught questions)")
+    p.add_argument("--dims", type=int, nargs="+", default=[1536, 1024, 512, 256])
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--max-chunks", type=int, default=2000)
+    p.add_argument("--json", type=Path, help="also write the report to this file")
+    p.set_defaults(func=cmd_embedding_report)
+
+    p = sub.add_parser("export-site", help="write a website's chunks, vectors, Q&A and profile to a snapshot file")
+    p.add_argument("--website", required=True)
+    p.add_argument("--out", type=Path, required=True)
+    p.set_defaults(func=cmd_export_site)
+
+    p = sub.add_parser("import-site", help="restore a snapshot file (no OpenAI calls)")
+    p.add_argument("file", type=Path)
+    p.add_argument("--replace", action="store_true", help="delete the website's existing objects first")
+    p.add_argument("--batch-size", type=int, default=200)
+    p.set_defaults(func=cmd_import_site)
+
+    p = sub.add_parser("teach-import", help="upsert Q&A pairs from a JSONL or CSV file")
+    p.add_argument("file", type=Path)
+    p.add_argument("--website", help="default website for rows without a website column")
+    p.add_argument("--format", choices=["jsonl", "csv"], help="default: from the file extension")
+    p.add_argument("--batch-size", type=int, default=100, help="questions per embeddings request / batch write")
+    p.set_defaults(func=cmd_teach_import)
+
+    p = sub.add_parser("teach-delete", help="delete the Q&A pairs whose questions are listed in a JSONL or CSV file")
+    p.add_argument("file", type=Path, nargs="?")
+    p.add_argument("--website", help="default website for rows without a website column")
+    p.add_argument("--format", choices=["jsonl", "csv"], help="default: from the file extension")
+    p.add_argument("--all", action="store_true", help="delete every taught pair of --website")
+    p.set_defaults(func=cmd_teach_delete)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    from app.weaviate_client import WeaviateUnavailable
+
+    args = build_parser().parse_args(argv)
+    try:
+        with correlation(new_correlation_id(args.command)):
+            return args.func(args)
+    except WeaviateUnavailable as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,10 @@ class Config:
                 full_app_config = yaml.safe_load(f)
                 self.app_config = full_app_config.get("app", {})
                 self.weaviate_config = full_app_config.get("weaviate", {})
+                self.session_config = full_app_config.get("sessions", {})
+                self.indexing_config = full_app_config.get("indexing", {})
+                self.admission_config = full_app_config.get("admission", {})
+                self.logging_config = full_app_config.get("logging", {})
         except Exception as e:
             raise RuntimeError(f"Failed to load application.yml: {e}")
 
@@ -29,21 +33,94 @@ class Config:
         # --- Validate & assign ---
         self.ALLOWED_ORIGINS = self._validate_origins(self.app_config.get("allowed_origins", []))
         self.INDEX_SECRET = os.getenv("INDEX_SECRET", "")
+        # Always send the Server-Timing breakdown (otherwise only on X-Debug-Timing)
+        self.TIMING_HEADER = bool(self.app_config.get("timing_header", False))
+
+        # Logging (text or one JSON object per line)
+        self.LOG_FORMAT = self._validate_log_format(
+            os.getenv("LOG_FORMAT", self.logging_config.get("format", "text"))
+        )
+        self.LOG_LEVEL = os.getenv("LOG_LEVEL", str(self.logging_config.get("level", "INFO"))).upper()
+        self.LOG_QUEUE_SIZE = int(self.logging_config.get("queue_size", 10000))
+        self.LOG_RATE_LIMIT_BURST = int(self.logging_config.get("rate_limit_burst", 5))
+        self.LOG_RATE_LIMIT_WINDOW = float(self.logging_config.get("rate_limit_window", 60))
+
+        # Conversation sessions (per worker process)
+        self.SESSION_TTL_SECONDS = float(self.session_config.get("ttl_seconds", 1800))
+        self.SESSION_MAX_SESSIONS = int(self.session_config.get("max_sessions", 10000))
+        self.SESSION_MAX_BYTES = int(self.session_config.get("max_bytes", 32 * 1024 * 1024))
+        self.SESSION_HISTORY_TOKENS = int(self.session_config.get("history_tokens", 400))
+        self.SESSION_KEEP_TURNS = int(self.session_config.get("keep_turns", 2))
+
+        # /ask admission control (per worker process)
+        self.ADMISSION_MAX_CONCURRENT = int(self.admission_config.get("max_concurrent", 8))
+        self.ADMISSION_PER_WEBSITE = int(self.admission_config.get("max_concurrent_per_website", 4))
+        self.ADMISSION_QUEUE_SIZE = int(self.admission_config.get("queue_size", 16))
+        self.ADMISSION_PER_WEBSITE_QUEUE = int(self.admission_config.get("per_website_queue", 8))
+        self.ADMISSION_MAX_WAIT = float(self.admission_config.get("max_wait_seconds", 5))
+
+        # Ingestion pipeline
+        self.CRAWL_LIMIT = int(self.indexing_config.get("crawl_limit", 10))
+        self.PIPELINE_QUEUE_SIZE = int(self.indexing_config.get("queue_size", 16))
+        self.PIPELINE_EXTRACT_WORKERS = int(self.indexing_config.get("extract_workers", 2))
+        self.PIPELINE_EMBED_WORKERS = int(self.indexing_config.get("embed_workers", 2))
+        self.STRIP_BOILERPLATE = bool(self.indexing_config.get("strip_boilerplate", True))
 
         # Weaviate
         self.WEAVIATE_URL = os.getenv(
             "WEAVIATE_URL",
             self.weaviate_config.get("url", "http://localhost:8080")
         )
+        self.ENSURE_SCHEMA_ON_STARTUP = os.getenv(
+            "ENSURE_SCHEMA_ON_STARTUP",
+            str(self.weaviate_config.get("ensure_schema_on_startup", True)),
+        ).lower() in ("1", "true", "yes")
+        self.WEAVIATE_HEALTH_INTERVAL = float(self.weaviate_config.get("health_interval", 10))
+        self.WEAVIATE_FAILURE_THRESHOLD = int(self.weaviate_config.get("failure_threshold", 3))
+        self.WEAVIATE_RESET_TIMEOUT = float(self.weaviate_config.get("reset_timeout", 15))
+        self.VECTOR_COMPRESSION = self._validate_compression(self.weaviate_config.get("compression"))
+        self.PQ_SEGMENTS = int(self.weaviate_config.get("pq_segments", 0))
+        self.PQ_TRAINING_LIMIT = int(self.weaviate_config.get("pq_training_limit", 100000))
 
         # LLM
         self.LLM_MODEL = self.llm_config.get("model", "gpt-4")
         self.LLM_EMBEDDING_MODEL = self.llm_config.get("embedding_model", "text-embedding-3-small")
+        dimensions = self.llm_config.get("embedding_dimensions")
+        self.LLM_EMBEDDING_DIMENSIONS = int(dimensions) if dimensions else None
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
+        # Generation tiers (cheapest first); defaults to the single chat model
+        self.LLM_TIERS = self._validate_tiers(self.llm_config.get("routing", {}).get("tiers"))
+
+        # Prompt context budget
+        context_config = self.llm_config.get("context", {})
+        self.CONTEXT_MAX_TOKENS = int(context_config.get("max_tokens", 1200))
+        self.CONTEXT_MIN_SCORE = float(context_config.get("min_score", 0.2))
+        self.CONTEXT_NEAR_DUPLICATE = float(context_config.get("near_duplicate", 0.8))
+        self.CONTEXT_TRIM_SENTENCES = bool(context_config.get("trim_sentences", False))
+
         if not self.OPENAI_API_KEY:
             raise RuntimeError("OPENAI_API_KEY is not set in .env or llm_config.yml")
 
+    def _validate_tiers(self, tiers):
+        if not tiers:
+            return [{"name": "default", "model": self.LLM_MODEL}]
+        if not isinstance(tiers, list) or not all(isinstance(t, dict) and t.get("model") for t in tiers):
+            raise ValueError("routing.tiers must be a list of {name, model, ...} in llm_config.yml")
+        return [{**t, "name": t.get("name") or t["model"]} for t in tiers]
+
+    def _validate_compression(self, compression):
+        compression = str(compression or "none").lower()
+        if compression not in ("none", "pq", "bq"):
+            raise ValueError("weaviate.compression must be one of none, pq, bq in application.yml")
+        return compression
+
+    def _validate_log_format(self, log_format):
+        log_format = str(log_format or "text").lower()
+        if log_format not in ("text", "json"):
+            raise ValueError("logging.format must be text or json in application.yml")
+        return log_format
+
     def _validate_origins(self, origins):
         if not isinstance(origins, list):
             raise ValueError("allowed_origins must be a list in application.yml")
@@ -0,0 +1,142 @@
+"""
+Token-budgeted prompt context assembly.
+
+Retrieved passages are ranked by relevance, de-duplicated (exact by chunk hash,
+near-duplicates by word-shingle overlap), optionally trimmed to the sentences
+closest to the question, and packed into a fixed token budget for the model.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+
+from app.config import config
+from app.logger import get_logger
+from app.metrics import span
+
+logger = get_logger("context")
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+SHINGLE_SIZE = 3
+MIN_PARTIAL_TOKENS = 40  # don't bother truncating a passage into a smaller gap
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens for `model` (defaults to the configured chat model)."""
+    try:
+        return len(_encoding(model or config.LLM_MODEL).encode(text))
+    except Exception:
+        # Encoding files unavailable: ~4 characters per token is close enough for budgeting
+        return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    try:
+        enc = _encoding(model or config.LLM_MODEL)
+        return enc.decode(enc.encode(text)[:max_tokens])
+    except Exception:
+        return text[: max_tokens * 4]
+
+
+def _words(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def _shingles(text: str) -> set:
+    words = _words(text)
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _overlap(a: set, b: set) -> float:
+    """Containment of the smaller set in the larger one (catches sub-passages too)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def trim_to_relevant_sentences(text: str, question: str, max_sentences: int = 4) -> str:
+    """Keep the sentences sharing most words with the question, in original order."""
+    sentences = [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+    if len(sentences) <= max_sentences:
+        return text
+    q_words = set(_words(question))
+    scored = [(len(q_words & set(_words(s))), i) for i, s in enumerate(sentences)]
+    if not any(score for score, _ in scored):
+        # No lexical overlap (e.g. other language): keep the passage as retrieved
+        return text
+    keep = sorted(i for _, i in sorted(scored, key=lambda x: (-x[0], x[1]))[:max_sentences])
+    return " ".join(sentences[i] for i in keep)
+
+
+def score_from_additional(item: dict) -> float:
+    """Relevance in [0, 1] from Weaviate's `_additional { distance }` (cosine)."""
+    distance = (item.get("_additional") or {}).get("distance")
+    return 1.0 - float(distance) if distance is not None else 0.0
+
+
+@span("ask.context")
+def build_context(
+    question: str,
+    passages: List[dict],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Pack passages into at most `max_tokens` tokens, best first.
+    Each passage is {"text", "score", "hash"?}; higher score = more relevant.
+    """
+    max_tokens = max_tokens or config.CONTEXT_MAX_TOKENS
+    ranked = sorted(passages, key=lambda p: p.get("score", 0.0), reverse=True)
+
+    seen_hashes = set()
+    kept_shingles: List[set] = []
+    parts: List[str] = []
+    used = 0
+    dropped = 0
+
+    for p in ranked:
+        text = (p.get("text") or "").strip()
+        if not text or p.get("score", 0.0) < config.CONTEXT_MIN_SCORE:
+            dropped += 1
+            continue
+        if p.get("hash"):
+            if p["hash"] in seen_hashes:
+                dropped += 1
+                continue
+            seen_hashes.add(p["hash"])
+
+        shingles = _shingles(text)
+        if any(_overlap(shingles, k) >= config.CONTEXT_NEAR_DUPLICATE for k in kept_shingles):
+            dropped += 1
+            continue
+
+        if config.CONTEXT_TRIM_SENTENCES:
+            text = trim_to_relevant_sentences(text, question)
+
+        tokens = count_tokens(text, model)
+        remaining = max_tokens - used
+        if tokens > remaining:
+            if remaining >= MIN_PARTIAL_TOKENS:
+                parts.append(truncate_tokens(text, remaining, model))
+                used = max_tokens
+            break
+
+        parts.append(text)
+        kept_shingles.append(shingles)
+        used += tokens
+
+    logger.info("Context: %d passages, %d/%d tokens, %d dropped", len(parts), used, max_tokens, dropped)
+    return "\n\n".join(parts)
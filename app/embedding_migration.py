@@ -0,0 +1,158 @@
+"""
+Re-embed stored objects after a change of embedding size or vector compression.
+
+Weaviate fixes the vector size (and BQ) when a class is created, so each class is
+rebuilt: objects are dumped to a JSONL file, the class is dropped and recreated
+with the current config, and the dump is re-embedded in batches and written back
+under the same ids. The dump is kept; if a run is interrupted after dumping,
+`resume=True` rebuilds the class from it again.
+"""
+
+import json
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import config
+from app.logger import get_logger
+from app.metrics import span
+from app.vectorizer import embed_batch
+from app.weaviate_client import VECTOR_CLASSES, batch_write, ensure_webcontent_schema, get_client
+
+logger = get_logger("embedding_migration")
+
+# Property embedded for each class
+EMBED_FIELDS = {"WebContent": "text", "CustomQA": "question"}
+PAGE_SIZE = 500
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+def iter_objects(client, class_name: str, properties: List[str], page_size: int = PAGE_SIZE) -> Iterator[dict]:
+    """Yield {"id", "properties"} for every object, using the cursor API."""
+    after = None
+    while True:
+        query = (
+            client.query.get(class_name, properties)
+            .with_additional(["id"])
+            .with_limit(page_size)
+        )
+        if after:
+            query = query.with_after(after)
+        rows = query.do().get("data", {}).get("Get", {}).get(class_name) or []
+        for row in rows:
+            after = row.pop("_additional")["id"]
+            yield {"id": after, "properties": row}
+        if len(rows) < page_size:
+            return
+
+
+def stored_dimensions(client, class_name: str) -> Optional[int]:
+    """Vector size of one stored object (None for an empty class)."""
+    res = client.query.get(class_name, []).with_additional(["vector"]).with_limit(1).do()
+    rows = res.get("data", {}).get("Get", {}).get(class_name) or []
+    return len(rows[0]["_additional"]["vector"]) if rows else None
+
+
+def count_objects(client, class_name: str) -> int:
+    res = client.query.aggregate(class_name).with_meta_count().do()
+    rows = res.get("data", {}).get("Aggregate", {}).get(class_name) or [{}]
+    return int((rows[0].get("meta") or {}).get("count") or 0)
+
+
+def dump_class(client, class_name: str, path: Path) -> int:
+    schema = client.schema.get(class_name)
+    properties = [p["name"] for p in schema.get("properties", [])]
+    n = 0
+    tmp = path.with_suffix(path.suffix + ".partial")
+    with tmp.open("w", encoding="utf-8") as f:
+        for obj in iter_objects(client, class_name, properties):
+            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            n += 1
+    tmp.replace(path)  # only a complete dump is ever resumed from
+    return n
+
+
+def _read_dump(path: Path) -> Iterator[dict]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _write_batch(client, class_name: str, batch: List[dict], field: str) -> Tuple[int, int]:
+    """Re-embed and write one batch; returns (written, written without a vector)."""
+    # The embeddings API rejects empty input, which would fail the whole batch
+    # (and every resume at the same place); such objects are kept without a vector
+    texts = [(obj["properties"].get(field) or "").strip() for obj in batch]
+    to_embed = [text for text in texts if text]
+    vectors = iter(embed_batch(to_embed) if to_embed else [])
+    rows = [(obj["id"], obj["properties"], next(vectors) if text else None) for obj, text in zip(batch, texts)]
+    with span("index.write"):
+        errors = batch_write(client, class_name, rows, batch_size=len(batch))
+    for err in errors[:3]:
+        logger.warning("%s: batch write error: %s", class_name, err)
+    failed = {str(err["id"]) for err in errors}
+    unembedded = sum(1 for uuid, _, vector in rows if vector is None and str(uuid) not in failed)
+    return len(batch) - len(errors), unembedded
+
+
+def reload_class(client, class_name: str, path: Path, batch_size: int) -> Tuple[int, int]:
+    """Rebuild a class from its dump; returns (written, written without a vector)."""
+    field = EMBED_FIELDS[class_name]
+    written = unembedded = 0
+    batch: List[dict] = []
+    for obj in _read_dump(path):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            w, u = _write_batch(client, class_name, batch, field)
+            written, unembedded = written + w, unembedded + u
+            batch = []
+            logger.info("%s: %d objects re-embedded", class_name, written)
+    if batch:
+        w, u = _write_batch(client, class_name, batch, field)
+        written, unembedded = written + w, unembedded + u
+    if unembedded:
+        logger.warning("%s: %d objects with empty %s were written without a vector", class_name, unembedded, field)
+    return written, unembedded
+
+
+def migrate_class(class_name: str, dump_dir: Path, batch_size: int = 100,
+                  resume: bool = False, dry_run: bool = False) -> dict:
+    client = get_client()
+    path = dump_dir / f"{class_name}.jsonl"
+    report = {
+        "class": class_name,
+        "objects": count_objects(client, class_name),
+        "storedDimensions": stored_dimensions(client, class_name),
+        "targetDimensions": config.LLM_EMBEDDING_DIMENSIONS or "model default",
+        "compression": config.VECTOR_COMPRESSION,
+    }
+    if dry_run:
+        return report
+
+    if resume and path.exists():
+        logger.info("%s: resuming from %s", class_name, path)
+    else:
+        report["dumped"] = dump_class(client, class_name, path)
+        logger.info("%s: dumped %d objects to %s", class_name, report["dumped"], path)
+    # The dump is complete at this point, so the class can always be rebuilt from it
+    if client.schema.exists(class_name):
+        client.schema.delete_class(class_name)
+        logger.info("%s: class dropped", class_name)
+
+    if not ensure_webcontent_schema():
+        raise MigrationError(f"{class_name}: could not recreate the class, rerun with --resume once Weaviate is fixed")
+    report["written"], report["withoutVector"] = reload_class(client, class_name, path, batch_size)
+    report["objectsAfter"] = count_objects(client, class_name)
+    report["storedDimensions"] = stored_dimensions(client, class_name)
+    logger.info("%s: migration finished, %d objects written", class_name, report["written"])
+    return report
+
+
+def migrate_embeddings(classes=VECTOR_CLASSES, dump_dir: Path = Path("."), batch_size: int = 100,
+                       resume: bool = False, dry_run: bool = False) -> List[dict]:
+    if not dry_run:
+        dump_dir.mkdir(parents=True, exist_ok=True)
+    return [migrate_class(name, dump_dir, batch_size, resume, dry_run) for name in classes]
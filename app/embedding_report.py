@@ -0,0 +1,166 @@
+"""
+Recall vs. memory for reduced embedding sizes and vector compression.
+
+Chunks of one website and a sample of real questions are embedded once at the
+model's full size. Smaller sizes are simulated the way the API produces them
+(prefix of the full vector, re-normalised), BQ by the sign bit per dimension.
+Recall@k is measured against exact top-k search on the full-size vectors, so a
+row answers "how many of today's best chunks would we still retrieve".
+
+Memory is the in-memory estimate per object (vectors + HNSW links); compressed
+indexes keep the full vectors on disk only. PQ recall depends on the trained
+codebook and is not simulated here; try it on a copy of the class.
+"""
+
+import operator
+from math import sqrt
+from typing import Dict, List, Sequence
+
+from app.config import config
+from app.logger import get_logger
+from app.vectorizer import embed_batch
+from app.weaviate_client import get_client
+
+logger = get_logger("embedding_report")
+
+HNSW_MAX_CONNECTIONS = 64
+HNSW_BYTES_PER_LINK = 10  # Weaviate's planning estimate, incl. layer overhead
+BQ_RESCORE_FACTOR = 4      # candidates fetched per result before rescoring
+MEMORY_OBJECTS = 100_000   # estimate memory for this many objects
+
+
+def _normalize(vec: Sequence[float]) -> List[float]:
+    norm = sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+def _sign_bits(vec: Sequence[float]) -> int:
+    bits = 0
+    for i, x in enumerate(vec):
+        if x > 0:
+            bits |= 1 << i
+    return bits
+
+
+def _top_k(scores: List[float], k: int) -> List[int]:
+    return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+
+
+def _recall(found: List[List[int]], truth: List[List[int]]) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    total = sum(len(t) for t in truth)
+    return round(hits / total, 4) if total else 0.0
+
+
+def memory_per_object(dims: int, compression: str) -> int:
+    """Estimated resident bytes per object for an HNSW index."""
+    links = HNSW_MAX_CONNECTIONS * HNSW_BYTES_PER_LINK
+    if compression == "bq":
+        return dims // 8 + links
+    if compression == "pq":
+        segments = config.PQ_SEGMENTS or max(1, dims // 4)
+        return segments + links
+    return dims * 4 + links
+
+
+def fetch_chunks(website: str, limit: int) -> List[str]:
+    res = (
+        get_client().query.get("WebContent", ["text"])
+        .with_where({"path": ["website"], "operator": "Equal", "valueText": website})
+        .with_limit(limit)
+        .do()
+    )
+    return [r["text"] for r in res.get("data", {}).get("Get", {}).get("WebContent") or [] if r.get("text")]
+
+
+def fetch_taught_questions(website: str, limit: int) -> List[str]:
+    """Questions fed via /teach — real user phrasing when no sample file is given."""
+    res = (
+        get_client().query.get("CustomQA", ["question"])
+        .with_where({"path": ["website"], "operator": "Equal", "valueText": website})
+        .with_limit(limit)
+        .do()
+    )
+    return [r["question"] for r in res.get("data", {}).get("Get", {}).get("CustomQA") or [] if r.get("question")]
+
+
+def evaluate(question_vecs: List[List[float]], chunk_vecs: List[List[float]],
+             dims_list: Sequence[int], k: int) -> List[Dict]:
+    """Recall@k per (dims, compression) for full-size question/chunk vectors."""
+    full = len(chunk_vecs[0])
+    k = min(k, len(chunk_vecs))
+    truth = [_top_k([_dot(q, c) for c in chunk_vecs], k) for q in question_vecs]
+
+    rows = []
+    for dims in sorted({d for d in dims_list if 0 < d <= full}, reverse=True):
+        qs = [_normalize(q[:dims]) for q in question_vecs]
+        cs = [_normalize(c[:dims]) for c in chunk_vecs]
+        exact = [[_dot(q, c) for c in cs] for q in qs]
+        found = [_top_k(s, k) for s in exact]
+
+        q_bits = [_sign_bits(q) for q in qs]
+        c_bits = [_sign_bits(c) for c in cs]
+        bq_raw, bq_rescored = [], []
+        for qi, qb in enumerate(q_bits):
+            hamming = [-(qb ^ cb).bit_count() for cb in c_bits]
+            candidates = _top_k(hamming, k * BQ_RESCORE_FACTOR)
+            bq_raw.append(candidates[:k])
+            bq_rescored.append(sorted(candidates, key=lambda i: exact[qi][i], reverse=True)[:k])
+
+        for compression, recall in (
+            ("none", _recall(found, truth)),
+            ("bq", _recall(bq_raw, truth)),
+            (f"bq+rescore x{BQ_RESCORE_FACTOR}", _recall(bq_rescored, truth)),
+            ("pq", None),
+        ):
+            bytes_per = memory_per_object(dims, compression.split("+")[0])
+            rows.append({
+                "dims": dims,
+                "compression": compression,
+                "bytesPerObject": bytes_per,
+                "mibPer100k": round(bytes_per * MEMORY_OBJECTS / 2**20, 1),
+                "recall": recall,
+            })
+    return rows
+
+
+def build_report(website: str, questions: List[str], dims_list: Sequence[int],
+                 k: int = 5, max_chunks: int = 2000) -> dict:
+    chunks = fetch_chunks(website, max_chunks)
+    if not questions:
+        questions = fetch_taught_questions(website, 200)
+    if not chunks or not questions:
+        raise ValueError(f"Need indexed chunks and sample questions for {website} "
+                         f"(got {len(chunks)} chunks, {len(questions)} questions)")
+
+    logger.info("Embedding %d chunks and %d questions at full size", len(chunks), len(questions))
+    chunk_vecs = [_normalize(v) for v in embed_batch(chunks, dimensions=0)]
+    question_vecs = [_normalize(v) for v in embed_batch(questions, dimensions=0)]
+    return {
+        "website": website,
+        "model": config.LLM_EMBEDDING_MODEL,
+        "fullDimensions": len(chunk_vecs[0]),
+        "chunks": len(chunks),
+        "questions": len(questions),
+        "k": min(k, len(chunks)),
+        "rows": evaluate(question_vecs, chunk_vecs, dims_list, k),
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"{report['model']} on {report['website']}: {report['chunks']} chunks, "
+        f"{report['questions']} questions, recall@{report['k']} vs. {report['fullDimensions']} dims",
+        f"{'dims':>6}  {'compression':<16}{'bytes/obj':>10}{'MiB/100k':>10}{'recall':>8}",
+    ]
+    for row in report["rows"]:
+        recall = "n/a" if row["recall"] is None else f"{row['recall']:.3f}"
+        lines.append(
+            f"{row['dims']:>6}  {row['compression']:<16}{row['bytesPerObject']:>10}"
+            f"{row['mibPer100k']:>10}{recall:>8}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,299 @@
+"""
+Cheap intent routing for questions that can be answered from BusinessProfile facts.
+
+Questions are classified with compiled multilingual keyword rules (en/de/fr/es/it).
+When a fact intent matches and the profile holds the field, the answer is built
+directly from the stored JSON fields (or the in-memory menu index) and the
+embedding + LLM round-trip is skipped.
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.logger import get_logger
+from app.menu_index import answer_items, answer_price, get_menu_index
+from app.metrics import cache_event, span
+
+logger = get_logger("intents")
+
+
+def _rx(*patterns: str) -> re.Pattern:
+    return re.compile(r"\b(?:" + "|".join(patterns) + r")\b", re.IGNORECASE)
+
+
+# "do you have ...?": a menu question if the menu index knows what is asked for
+DISH_QUESTION_RE = _rx(r"do you (?:have|serve|offer)", r"gibt es", r"habt ihr", r"avez-vous", r"tienen", r"avete")
+
+# intent -> [(pattern, weight)]; weight 2 = strong signal, 1 = weak hint.
+# Weak hints ("where", "when", "number") never pick an intent on their own;
+# they only break ties between intents that already have a strong signal.
+INTENT_RULES: Dict[str, List[Tuple[re.Pattern, int]]] = {
+    "hours": [
+        (_rx(r"opening hours?", r"open(?:ing)? times?", r"(?:your|the|business|store|shop|kitchen) hours",
+             r"hours of operation", r"(?:(?:mon|tues|wednes|thurs|fri|satur|sun)day|weekend|holiday) hours",
+             r"öffnungszeiten?", r"geöffnet", r"offen", r"ruhetag",
+             r"horaires?", r"ouvert", r"horario", r"abierto", r"orari", r"aperto",
+             r"(?:are|is) (?:you|it|\w+) (?:still )?(?:open|closed)",
+             r"opens? (?:on|today|tonight|tomorrow|now|late|until|at)",
+             r"(?:when|what time) do (?:you|they) (?:open|close)", r"closing times?", r"closed on"), 2),
+        # bare "hours" also means a duration ("free for 2 hours", "hours in advance")
+        (_rx(r"open", r"close[ds]?", r"closing", r"hours", r"when", r"wann"), 1),
+    ],
+    "phone": [
+        (_rx(r"phone", r"telephone", r"phone number", r"call (?:you|us)", r"ring",
+             r"telefon(?:nummer)?", r"anrufen", r"téléphone", r"teléfono", r"telefono",
+             r"llamar", r"chiamare", r"your (?:phone )?number", r"contact number"), 2),
+        (_rx(r"call", r"number", r"nummer"), 1),
+    ],
+    "email": [
+        (_rx(r"e-?mail", r"mail address", r"courriel", r"correo", r"posta elettronica"), 2),
+        (_rx(r"write to", r"contact", r"kontakt"), 1),
+    ],
+    "address": [
+        (_rx(r"(?<!mail )address", r"located", r"location", r"directions", r"adresse", r"anschrift",
+             r"standort", r"dirección", r"direccion", r"indirizzo", r"où (?:êtes|se trouve)",
+             r"wo (?:seid|sind|ist|befindet)", r"dónde (?:está|están)", r"dove (?:siete|si trova)",
+             r"where are you", r"where is (?:the|your) (?:restaurant|shop|store|office|place)",
+             r"find you", r"get (?:there|to you)"), 2),
+        (_rx(r"where"), 1),
+    ],
+    "menu": [
+        (_rx(r"menu", r"menus", r"speisekarte", r"menú", r"(?:die|eure|ihre|deine) karte",
+             r"(?:la|votre|ta) carte(?! (?:bancaire|bleue|de crédit|de credit|cadeau))",
+             r"(?:la|su|vuestra) carta(?! (?:di|de) cr[eé]dito)"), 2),
+        # Karte/carte/carta on their own are just as often a payment card
+        (_rx(r"karte", r"carte", r"carta"), 1),
+    ],
+    "price_range": [
+        (_rx(r"price range", r"how expensive", r"expensive", r"cheap", r"affordable",
+             r"preisklasse", r"preisniveau", r"teuer", r"günstig", r"cher", r"caro", r"barato"), 2),
+    ],
+    "cuisine": [
+        (_rx(r"cuisine", r"kind of food", r"type of food", r"what food", r"küche",
+             r"cocina", r"cucina"), 2),
+    ],
+    "price": [
+        (_rx(r"how much", r"what does .+ cost", r"price of", r"prices? for", r"was kostet",
+             r"kostet", r"combien", r"cuánto cuesta", r"cuanto cuesta", r"quanto costa"), 2),
+    ],
+    "menu_items": [
+        (_rx(r"desserts?", r"starters?", r"appetizers?", r"drinks", r"beverages", r"salads?",
+             r"vorspeisen", r"nachspeisen", r"nachtisch", r"getränke", r"beilagen",
+             r"dolci", r"antipasti", r"postres", r"bebidas"), 2),
+        (DISH_QUESTION_RE, 1),
+    ],
+    "social": [
+        (_rx(r"instagram", r"facebook", r"tiktok", r"twitter", r"social media", r"socials"), 2),
+    ],
+}
+
+# More specific intents win over the generic ones they overlap with
+SUBSUMES = {
+    "price": {"menu", "price_range", "menu_items"},
+    "menu_items": {"menu"},
+}
+
+MENU_INTENTS = {"price", "menu_items"}
+
+DAY_RULES: List[Tuple[str, re.Pattern]] = [
+    ("Mo", _rx(r"monday", r"montag", r"lundi", r"lunes", r"lunedì", r"lunedi")),
+    ("Tu", _rx(r"tuesday", r"dienstag", r"mardi", r"martes", r"martedì", r"martedi")),
+    ("We", _rx(r"wednesday", r"mittwoch", r"mercredi", r"miércoles", r"miercoles", r"mercoledì", r"mercoledi")),
+    ("Th", _rx(r"thursday", r"donnerstag", r"jeudi", r"jueves", r"giovedì", r"giovedi")),
+    ("Fr", _rx(r"friday", r"freitag", r"vendredi", r"viernes", r"venerdì", r"venerdi")),
+    ("Sa", _rx(r"saturday", r"samstag", r"sonnabend", r"samedi", r"sábado", r"sabado", r"sabato")),
+    ("Su", _rx(r"sunday", r"sonntag", r"dimanche", r"domingo", r"domenica")),
+]
+DAY_ORDER = [code for code, _ in DAY_RULES]
+DAY_NAMES = dict(zip(DAY_ORDER, ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]))
+DAY_TOKEN_RE = re.compile(r"\b(Mo|Tu|We|Th|Fr|Sa|Su)\b(?:\s*-\s*\b(Mo|Tu|We|Th|Fr|Sa|Su)\b)?")
+
+
+def classify_intent(question: str) -> Optional[str]:
+    """
+    Return the single fact intent a question asks for, or None.
+    Only intents with a strong signal qualify; when several do, a weak hint
+    breaks the tie, otherwise the question is left to retrieval + LLM.
+    """
+    scores: Dict[str, int] = {}
+    for intent, rules in INTENT_RULES.items():
+        hits = [weight for pattern, weight in rules if pattern.search(question)]
+        if 2 in hits:
+            scores[intent] = 2 + (1 in hits)  # strong, plus 1 if a weak hint agrees
+
+    if not scores:
+        return None
+    for intent, hidden in SUBSUMES.items():
+        if intent in scores:
+            for other in hidden:
+                scores.pop(other, None)
+    best = max(scores.values())
+    top = [i for i, s in scores.items() if s == best]
+    return top[0] if len(top) == 1 else None
+
+
+def _loads(val):
+    """Profile text fields may hold JSON strings; decode them when possible."""
+    if isinstance(val, str):
+        try:
+            return json.loads(val)
+        except ValueError:
+            return val
+    return val
+
+
+def _as_list(val) -> List:
+    val = _loads(val)
+    if not val:
+        return []
+    return val if isinstance(val, list) else [val]
+
+
+def _format_address(val) -> str:
+    val = _loads(val)
+    if isinstance(val, dict):
+        parts = [val.get(k) for k in ("streetAddress", "postalCode", "addressLocality", "addressCountry")]
+        return ", ".join(str(p) for p in parts if p)
+    return str(val)
+
+
+def _hours_entries(val) -> List[str]:
+    entries = []
+    for e in _as_list(val):
+        if isinstance(e, dict):
+            # schema.org OpeningHoursSpecification
+            days = e.get("dayOfWeek") or []
+            days = days if isinstance(days, list) else [days]
+            day_str = ",".join(str(d).rsplit("/", 1)[-1][:2] for d in days)
+            entries.append(f"{day_str} {e.get('opens', '')}-{e.get('closes', '')}".strip())
+        elif e:
+            entries.append(str(e))
+    return entries
+
+
+def _entry_days(entry: str) -> set:
+    days = set()
+    for m in DAY_TOKEN_RE.finditer(entry):
+        start, end = m.group(1), m.group(2)
+        if not end:
+            days.add(start)
+            continue
+        i, j = DAY_ORDER.index(start), DAY_ORDER.index(end)
+        span = DAY_ORDER[i:j + 1] if i <= j else DAY_ORDER[i:] + DAY_ORDER[:j + 1]
+        days.update(span)
+    return days
+
+
+def _answer_hours(question: str, profile: dict) -> Optional[str]:
+    entries = _hours_entries(profile.get("openingHours"))
+    if not entries:
+        return None
+    listing = "; ".join(entries)
+
+    day = next((code for code, pattern in DAY_RULES if pattern.search(question)), None)
+    if not day:
+        return f"Opening hours: {listing}"
+
+    matching = [e for e in entries if day in _entry_days(e)]
+    if matching:
+        return f"On {DAY_NAMES[day]}: {'; '.join(matching)}"
+    if all(_entry_days(e) for e in entries):
+        return f"{DAY_NAMES[day]} is not listed in the opening hours ({listing}), so we are likely closed."
+    return f"Opening hours: {listing}"
+
+
+def _answer_social(profile: dict) -> Optional[str]:
+    links = _as_list(profile.get("social"))
+    if len(links) == 1 and isinstance(links[0], str) and "," in links[0]:
+        links = [s.strip() for s in links[0].split(",")]
+    links = [str(l) for l in links if l]
+    return f"You can find us here: {', '.join(links)}" if links else None
+
+
+def answer_intent(intent: str, question: str, profile: dict) -> Optional[str]:
+    """Build an answer for `intent` from profile fields, or None if the field is empty."""
+    if intent == "hours":
+        return _answer_hours(question, profile)
+    if intent == "phone" and profile.get("telephone"):
+        return f"The phone number is {profile['telephone']}"
+    if intent == "email" and profile.get("email"):
+        return f"The email address is {profile['email']}"
+    if intent == "address" and profile.get("address"):
+        return f"The address is {_format_address(profile['address'])}"
+    if intent == "menu":
+        urls = _as_list(profile.get("menuUrls"))
+        return f"Menu: {', '.join(urls)}" if urls else None
+    if intent == "price_range" and profile.get("priceRange"):
+        return f"Our price range is {profile['priceRange']}"
+    if intent == "cuisine":
+        cuisines = _as_list(profile.get("cuisines"))
+        return f"We serve {', '.join(cuisines)} cuisine" if cuisines else None
+    if intent == "social":
+        return _answer_social(profile)
+    return None
+
+
+class FastPathStats:
+    """Thread-safe counters for how often the router answers without the LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.answered = 0
+        self.by_intent: Dict[str, int] = {}
+        self.total_ms = 0.0
+
+    def record(self, intent: Optional[str], answered: bool, elapsed_ms: float):
+        with self._lock:
+            self.questions += 1
+            if answered:
+                self.answered += 1
+                self.total_ms += elapsed_ms
+                self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "questions": self.questions,
+                "answered": self.answered,
+                "hitRate": round(self.answered / self.questions, 4) if self.questions else 0.0,
+                "avgMs": round(self.total_ms / self.answered, 2) if self.answered else 0.0,
+                "byIntent": dict(self.by_intent),
+            }
+
+
+stats = FastPathStats()
+
+
+@span("ask.fast_path")
+def route(question: str, website: str, fetch_profile) -> Optional[str]:
+    """
+    Classify `question` and answer it from the profile or menu index if possible.
+    `fetch_profile` is only called when a fact intent (or a "do you have ...?"
+    question) matched, and for menu lookups only when the website's menu index
+    is not cached yet.
+    """
+    start = time.perf_counter()
+    intent = classify_intent(question)
+    index = None
+    if intent is None and DISH_QUESTION_RE.search(question):
+        # "do you have funghi pizza?" names no section, only the dish
+        index = get_menu_index(website, lambda: (fetch_profile() or {}).get("menuItems"))
+        if index.search(question):
+            intent = "menu_items"
+    answer = None
+    if intent in MENU_INTENTS:
+        if index is None:
+            index = get_menu_index(website, lambda: (fetch_profile() or {}).get("menuItems"))
+        answer = answer_price(question, index) if intent == "price" else answer_items(question, index)
+    elif intent:
+        answer = answer_intent(intent, question, fetch_profile() or {})
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    stats.record(intent, answer is not None, elapsed_ms)
+    cache_event("fast_path", answer is not None)
+    if answer:
+        logger.info("Fast path answered intent=%s in %.1f ms", intent, elapsed_ms)
+    return answer
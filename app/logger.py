@@ -1,15 +1,221 @@
+"""
+Logging: non-blocking, structured, correlated.
+
+Records are put on a bounded in-memory queue by the calling thread and written
+to stdout by one background thread, so a slow or blocked stdout never adds
+latency to request threads. Message formatting (`%`-style args) also happens on
+the writer thread; pass arguments instead of building f-strings in hot loops:
+
+    logger.warning("Chunk upload failed for %d/%d chunks: %s", failed, total, err)
+
+Every record carries the current correlation id: the request id set by the
+HTTP middleware, or a job id for /index and CLI runs. Threads started on behalf
+of a request get it through `with_correlation`.
+
+Repeated warnings/errors with the same message template are rate limited per
+logger (`logging.rate_limit_burst` per `logging.rate_limit_window` seconds);
+the next record let through reports how many were suppressed. If the queue is
+full, records are dropped (and counted) rather than blocking the caller.
+"""
+
+import atexit
+import json
 import logging
+import queue
+import secrets
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from app.config import config
+
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] %(name)s [%(correlation_id)s]: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "correlation_id"}
+
+
+def new_correlation_id(prefix: str = "") -> str:
+    token = secrets.token_hex(8)
+    return f"{prefix}-{token}" if prefix else token
+
+
+@contextmanager
+def correlation(value: str) -> Iterator[str]:
+    """Tag every record logged inside the block (in this thread/task) with `value`."""
+    token = correlation_id.set(value)
+    try:
+        yield value
+    finally:
+        correlation_id.reset(token)
+
+
+def with_correlation(fn: Callable) -> Callable:
+    """Wrap a thread target so it logs with the caller's correlation id."""
+    value = correlation_id.get()
+
+    def run(*args, **kwargs):
+        correlation_id.set(value)  # a new thread starts with an empty context
+        return fn(*args, **kwargs)
+
+    return run
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields are included as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "correlationId": record.correlation_id,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `burst` WARNING/ERROR records per (logger, level, template)
+    through per `window` seconds. Runs in the calling thread, before queueing.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        # key -> [window start, records let through, suppressed]
+        self._seen: Dict[Tuple[str, int, str], list] = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno < logging.WARNING or record.levelno >= logging.CRITICAL:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._seen.get(key)
+            if state is None or now - state[0] >= self.window:
+                if len(self._seen) > 10000:  # templates are finite; guard against f-string keys
+                    self._seen.clear()
+                suppressed = state[2] if state else 0
+                self._seen[key] = [now, 1, 0]
+            elif state[1] < self.burst:
+                state[1] += 1
+                suppressed = 0
+            else:
+                state[2] += 1
+                self.suppressed += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _CorrelationFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep msg/args as they are: formatting happens on the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+class _Writer(logging.StreamHandler):
+    """stdout handler on the listener thread; reports records dropped on a full queue."""
+
+    def __init__(self, source: _NonBlockingQueueHandler):
+        super().__init__(sys.stdout)
+        self.source = source
+        self.reported = 0
+
+    def emit(self, record: logging.LogRecord):
+        dropped = self.source.dropped
+        if dropped > self.reported:
+            notice = logging.LogRecord("logger", logging.WARNING, __file__, 0,
+                                       "Log queue full, dropped %d records", (dropped - self.reported,), None)
+            notice.correlation_id = "-"
+            self.reported = dropped
+            super().emit(notice)
+        super().emit(record)
+
+
+_lock = threading.Lock()
+_handler: Optional[_NonBlockingQueueHandler] = None
+_rate_limit: Optional[RateLimitFilter] = None
+_listener: Optional[QueueListener] = None
+
+
+def _setup() -> _NonBlockingQueueHandler:
+    global _handler, _rate_limit, _listener
+    with _lock:
+        if _handler is not None:
+            return _handler
+        handler = _NonBlockingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+        _rate_limit = RateLimitFilter(config.LOG_RATE_LIMIT_BURST, config.LOG_RATE_LIMIT_WINDOW)
+        handler.addFilter(_CorrelationFilter())
+        handler.addFilter(_rate_limit)
+
+        writer = _Writer(handler)
+        if config.LOG_FORMAT == "json":
+            writer.setFormatter(JsonFormatter())
+        else:
+            writer.setFormatter(_TextFormatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+        _listener = QueueListener(handler.queue, writer)
+        _listener.start()
+        atexit.register(_listener.stop)  # flush what is still queued
+        _handler = handler
+        return handler
+
 
 def get_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        fmt = logging.Formatter(
-            "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
-        handler.setFormatter(fmt)
-        logger.addHandler(handler)
-        logger.setLevel(logging.INFO)
+        logger.addHandler(_setup())
+        logger.setLevel(config.LOG_LEVEL)
+        logger.propagate = False
     return logger
+
+
+def stats() -> dict:
+    """Records dropped on a full queue and suppressed by rate limiting (this worker)."""
+    return {
+        "dropped": _handler.dropped if _handler else 0,
+        "suppressed": _rate_limit.suppressed if _rate_limit else 0,
+        "queued": _handler.queue.qsize() if _handler else 0,
+    }
@@ -1,19 +1,76 @@
-from fastapi import FastAPI, Query, HTTPException, Header
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Query, HTTPException, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from datetime import datetime, timezone
-from openai import OpenAI
+from typing import Optional
 
-from app.chatbot import ask
+from app.admission import Rejected, admission
+from app.chatbot import fast_answer, menu_lines
 from app.config import config
-from app.logger import get_logger
-from app.vectorizer import upload_documents
-from app.weaviate_client import get_client, ensure_webcontent_schema
-from app.website_loader import crawl_website, detect_and_store_site_profile
+from app.context_builder import build_context, count_tokens, score_from_additional
+from app.intents import stats as fast_path_stats
+from app.logger import correlation, get_logger, new_correlation_id, stats as logging_stats
+from app.metrics import (
+    REQUEST_SECONDS,
+    REQUESTS,
+    render_metrics,
+    server_timing_header,
+    span,
+    start_request_timings,
+)
+from app.model_router import generate, generate_stream, stats as model_tier_stats
+from app.openai_client import get_openai
+from app.pipeline import index_website as run_index_pipeline
+from app.sessions import record_turn, standalone_question, store as session_store
+from app.singleflight import SingleFlight, normalize_question
+from app.teach import (
+    MAX_BULK_BYTES,
+    TeachError,
+    bulk_delete,
+    bulk_teach,
+    delete_website,
+    detect_format,
+    parse_rows,
+    teach,
+)
+from app.vectorizer import embed
+from app.weaviate_client import (
+    WeaviateUnavailable,
+    ensure_webcontent_schema,
+    get_client,
+    guarded,
+    health,
+)
 
-app = FastAPI()
 logger = get_logger("main")
 
+SESSION_HEADER = "X-Session-Id"
+REQUEST_ID_HEADER = "X-Request-Id"
+MAX_REQUEST_ID_LENGTH = 64
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build clients and start the Weaviate health monitor once per worker.
+    The schema check is skipped when it is run once per deployment instead
+    (ENSURE_SCHEMA_ON_STARTUP=false + `python -m app.cli ensure-schema`).
+    """
+    get_openai()
+    health.start()
+    if config.ENSURE_SCHEMA_ON_STARTUP:
+        ensure_webcontent_schema()
+    yield
+    health.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+ask_flight = SingleFlight("ask")
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -21,11 +78,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SESSION_HEADER, REQUEST_ID_HEADER],
 )
 
-# Ensure schema exists in Weaviate
-ensure_webcontent_schema()
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Tag logs with a request id (the caller's X-Request-Id or a new one) and
+    record request latency; optionally return the per-stage breakdown.
+    """
+    request_id = request.headers.get(REQUEST_ID_HEADER, "")
+    if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH or not request_id.isprintable():
+        request_id = new_correlation_id()
+    timings = start_request_timings()
+    start = time.perf_counter()
+    with correlation(request_id):
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    response.headers[REQUEST_ID_HEADER] = request_id
+
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    REQUEST_SECONDS.observe(elapsed, path=path, method=request.method)
+    REQUESTS.inc(path=path, method=request.method, status=response.status_code)
+
+    if config.TIMING_HEADER or request.headers.get("X-Debug-Timing"):
+        timings["total"] = elapsed * 1000
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
 
 def is_website_indexed(website: str) -> bool:
     """Check if site is already in Weaviate."""
@@ -44,7 +125,7 @@ def is_website_indexed(website: str) -> bool:
         docs = result.get("data", {}).get("Get", {}).get("WebContent", [])
         return len(docs) > 0
     except Exception as e:
-        logger.error(f"Check index failed: {e}")
+        logger.error("Check index failed: %s", e)
         return False
 
 
@@ -55,17 +136,15 @@ def index_website(
 ):
     """Admin-only: Crawl & index site content + detect profile."""
     if x_index_token != config.INDEX_SECRET:
-        logger.warning(f"Unauthorized index attempt for {website}")
+        logger.warning("Unauthorized index attempt for %s", website)
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    logger.info(f"Indexing website: {website}")
-    docs = crawl_website(website)
-    upload_documents(docs, website)
-
-    # Detect menus, contact info, business type
-    detect_and_store_site_profile(website, docs)
-
-    return {"message": f"Indexed {len(docs)} pages from {website}"}
+    # Job id correlates the crawl, pipeline threads and profile detection logs
+    with correlation(new_correlation_id("index")) as job_id:
+        logger.info("Indexing website: %s", website)
+        # Streaming crawl → extract → chunk → embed → write, then profile detection
+        report = run_index_pipeline(website, limit=config.CRAWL_LIMIT)
+    return {"message": f"Indexed {report['pages']} pages from {website}", "jobId": job_id, "pipeline": report}
 
 class TeachRequest(BaseModel):
     website: str
@@ -75,83 +154,226 @@ class TeachRequest(BaseModel):
 
 @app.post("/teach")
 def teach_custom_qa(req: TeachRequest):
+    """Admin-only: add or update one Q&A pair (re-teaching a question replaces its answer)."""
     if req.token != config.INDEX_SECRET:
         raise HTTPException(status_code=403, detail="Invalid token")
 
-    weaviate_client = get_client()
-    openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
-
     try:
-        emb_response = openai_client.embeddings.create(
-            model=config.LLM_EMBEDDING_MODEL,   # <-- FIXED
-            input=req.question
-        )
-        vector = emb_response.data[0].embedding
+        obj_id = teach(req.website, req.question, req.answer)
+    except TeachError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WeaviateUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        # better error visibility
-        raise HTTPException(status_code=500, detail=f"Embedding creation failed: {repr(e)}")
-
-    obj = {
-        "website": req.website,
-        "question": req.question,
-        "answer": req.answer,
-        "createdAt": datetime.now(timezone.utc).isoformat()
-    }
+        raise HTTPException(status_code=500, detail=f"Failed to store QA: {repr(e)}")
+    return {"status": "success", "message": "Custom QA saved with embedding", "id": obj_id}
+
 
+async def _bulk_rows(request: Request, fmt: Optional[str]) -> tuple:
+    body = await request.body()
+    if len(body) > MAX_BULK_BYTES:
+        raise HTTPException(status_code=413, detail=f"Body exceeds {MAX_BULK_BYTES} bytes; split the file")
     try:
-        weaviate_client.data_object.create(
-            data_object=obj,
-            class_name="CustomQA",
-            vector=vector
-        )
-        return {"status": "success", "message": "Custom QA added with embedding"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to store QA: {repr(e)}")
+        text = body.decode("utf-8-sig")
+        return parse_rows(text, fmt or detect_format(content_type=request.headers.get("content-type")))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+    except TeachError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _run_bulk(fn, *args):
+    try:
+        return await run_in_threadpool(fn, *args)
+    except WeaviateUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
+@app.post("/teach/bulk")
+async def teach_bulk(
+        request: Request,
+        website: str = Query(..., description="Default website for rows without one"),
+        format: Optional[str] = Query(None, pattern="^(jsonl|csv)$", description="Body format (default: from Content-Type)"),
+        x_index_token: str = Header(..., alias="X-INDEX-TOKEN"),
+):
+    """Admin-only: upsert Q&A pairs from a JSONL or CSV body; reports failed rows."""
+    if x_index_token != config.INDEX_SECRET:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    rows, errors = await _bulk_rows(request, format)
+    report = await _run_bulk(bulk_teach, rows, website)
+    report["rows"] += len(errors)
+    report["failed"] = sorted(errors + report["failed"], key=lambda f: f["row"] or 0)
+    return report
+
+
+@app.post("/teach/delete")
+async def teach_delete(
+        request: Request,
+        website: str = Query(..., description="Default website for rows without one"),
+        all: bool = Query(False, description="Delete every taught pair of the website (body ignored)"),
+        format: Optional[str] = Query(None, pattern="^(jsonl|csv)$", description="Body format (default: from Content-Type)"),
+        x_index_token: str = Header(..., alias="X-INDEX-TOKEN"),
+):
+    """Admin-only: delete the Q&A pairs whose questions are listed in a JSONL or CSV body."""
+    if x_index_token != config.INDEX_SECRET:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if all:
+        return {"deleted": await _run_bulk(delete_website, website)}
+    rows, errors = await _bulk_rows(request, format)
+    report = await _run_bulk(bulk_delete, rows, website)
+    report["rows"] += len(errors)
+    report["failed"] = sorted(errors + report["failed"], key=lambda f: f["row"] or 0)
+    return report
+
 
 class AskRequest(BaseModel):
     q: str
     website: str
+    stream: bool = False
+    # Returned in the X-Session-Id header; send it back to continue the conversation
+    session_id: Optional[str] = None
 
-@app.post("/ask")
-def ask_endpoint(req: AskRequest):
-    client = get_client()
-    openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
-
-    emb_response = openai_client.embeddings.create(
-        model=config.LLM_EMBEDDING_MODEL,      # <-- FIXED
-        input=req.q
-    )
-    query_vector = emb_response.data[0].embedding
-
-    wc_results = client.query.get(
-        "WebContent", ["text", "source"]
-    ).with_near_vector({"vector": query_vector}).with_where({
-        "path": ["website"], "operator": "Equal", "valueText": req.website
-    }).with_limit(3).do().get("data", {}).get("Get", {}).get("WebContent", [])
-
-    qa_results = client.query.get(
-        "CustomQA", ["question", "answer"]
-    ).with_near_vector({"vector": query_vector}).with_where({
-        "path": ["website"], "operator": "Equal", "valueText": req.website
-    }).with_limit(3).do().get("data", {}).get("Get", {}).get("CustomQA", [])
-
-    context_parts = [r.get("text","") for r in wc_results] + [
-        f"Q: {r.get('question')}\nA: {r.get('answer')}" for r in qa_results
+
+def _build_prompt(question: str, website: str) -> tuple[list[dict], float, int]:
+    """Retrieve context for the question; returns (messages, best_score, context_tokens)."""
+    query_vector = embed(question)
+
+    with span("ask.retrieve"), guarded() as client:
+        wc_results = client.query.get(
+            "WebContent", ["text", "source", "hash", "_additional { distance }"]
+        ).with_near_vector({"vector": query_vector}).with_where({
+            "path": ["website"], "operator": "Equal", "valueText": website
+        }).with_limit(6).do().get("data", {}).get("Get", {}).get("WebContent", [])
+
+        qa_results = client.query.get(
+            "CustomQA", ["question", "answer", "_additional { distance }"]
+        ).with_near_vector({"vector": query_vector}).with_where({
+            "path": ["website"], "operator": "Equal", "valueText": website
+        }).with_limit(3).do().get("data", {}).get("Get", {}).get("CustomQA", [])
+
+    passages = [
+        {"text": r.get("text", ""), "score": score_from_additional(r), "hash": r.get("hash")}
+        for r in wc_results
+    ] + [
+        {"text": f"Q: {r.get('question')}\nA: {r.get('answer')}", "score": score_from_additional(r)}
+        for r in qa_results
     ]
-    context = "\n\n".join(context_parts)
-
-    completion = openai_client.chat.completions.create(
-        model=config.LLM_MODEL,
-        messages=[
-            {"role": "system", "content": "Answer based only on the provided context."},
-            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {req.q}"}
-        ]
-        # don't set temperature if your model doesn't support it
-    )
-    return completion.choices[0].message.content.strip()
+    # Tier routing reflects retrieval quality only, not the always-relevant menu lines
+    best_score = max((p["score"] for p in passages), default=0.0)
+    menu = menu_lines(question, website)
+    if menu:
+        passages.append({"text": menu, "score": 1.0})
+    context = build_context(question, passages)
+
+    messages = [
+        {"role": "system", "content": "Answer based only on the provided context."},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
+    ]
+    return messages, best_score, count_tokens(context)
+
+
+def _answer(question: str, website: str) -> str:
+    with admission.admit(website):
+        messages, best_score, context_tokens = _build_prompt(question, website)
+        return generate(get_openai(), messages, question, best_score=best_score, context_tokens=context_tokens)
+
+
+def _start_answer_stream(question: str, website: str):
+    """
+    Take an admission slot for a new stream (a rejection is still a 429/503)
+    and return its producer, which gives the slot back when it ends.
+    """
+    with span("ask.admission"):
+        admission.acquire(website)
+    return _answer_stream(question, website, time.monotonic())
+
+
+def _answer_stream(question: str, website: str, admitted_at: float):
+    # Drained to the end by the single-flight pump thread, even if every client disconnects
+    try:
+        messages, best_score, context_tokens = _build_prompt(question, website)
+        yield from generate_stream(get_openai(), messages, question, best_score=best_score, context_tokens=context_tokens)
+    finally:
+        admission.release(website, time.monotonic() - admitted_at)
+
+
+def _recorded(chunks, session, question: str):
+    """Pass a stream through and store the full answer as the session's turn."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    record_turn(session, question, "".join(parts))
+
+
+@app.post("/ask")
+def ask_endpoint(req: AskRequest, response: Response):
+    session = session_store.resume(req.session_id, req.website)
+    headers = {SESSION_HEADER: session.id}
+    response.headers.update(headers)
+    try:
+        # Fact questions are answered as asked, before any (model-based) rewrite
+        question = req.q
+        answer = fast_answer(question, req.website)
+        if not answer:
+            # Follow-ups become standalone questions, so the caches and retrieval still apply
+            question = standalone_question(session, req.q)
+            if question != req.q:
+                answer = fast_answer(question, req.website)
+        if answer:
+            record_turn(session, question, answer)
+            if req.stream:
+                return StreamingResponse(iter([answer]), media_type="text/plain", headers=headers)
+            return answer
+
+        # Identical questions in flight for the same site share one computation;
+        # only the caller that runs it takes an admission slot
+        key = (req.website, normalize_question(question))
+        if req.stream:
+            get_client()  # fail fast before the stream starts if Weaviate is down
+            chunks = ask_flight.stream(key, lambda: _start_answer_stream(question, req.website))
+            return StreamingResponse(
+                _recorded(chunks, session, question),
+                media_type="text/plain",
+                headers=headers,
+            )
+        answer = ask_flight.do(key, lambda: _answer(question, req.website))
+        record_turn(session, question, answer)
+        return answer
+    except Rejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Too busy ({e.reason}), retry later",
+            headers={"Retry-After": str(e.retry_after), **headers},
+        )
+    except WeaviateUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(config.WEAVIATE_RESET_TIMEOUT)), **headers},
+        )
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    """Service status including the background-monitored Weaviate state."""
+    health.start()
+    weaviate_status = health.status()
+    return {"status": "ok" if weaviate_status["ready"] else "degraded", "weaviate": weaviate_status}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+def stats():
+    """Fast-path (no-LLM) hit rate, per-tier latency, sessions, admission and logging state."""
+    return {
+        "fastPath": fast_path_stats.snapshot(),
+        "admission": admission.snapshot(),
+        "modelTiers": model_tier_stats.snapshot(),
+        "sessions": session_store.snapshot(),
+        "logging": logging_stats(),
+    }
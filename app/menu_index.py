@@ -0,0 +1,206 @@
+"""
+In-memory per-website menu search over structured {section, name, price} items.
+
+An inverted index maps normalized dish tokens to items (with fuzzy matching over
+the vocabulary), and a section index maps canonical section names to items.
+Indexes are built at index time and lazily rebuilt from BusinessProfile.menuItems.
+"""
+
+import difflib
+import json
+import re
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.logger import get_logger
+from app.metrics import cache_event
+
+logger = get_logger("menu_index")
+
+INDEX_TTL_SECONDS = 3600
+EMPTY_INDEX_TTL_SECONDS = 60  # retry soon if the profile was missing or unreachable
+FUZZY_CUTOFF = 0.8
+MIN_QUERY_COVERAGE = 0.5
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    # en
+    "a", "an", "and", "any", "are", "can", "cost", "costs", "do", "does", "for", "get", "have",
+    "how", "i", "is", "it", "me", "much", "of", "on", "or", "price", "prices", "serve", "the",
+    "there", "what", "which", "with", "you", "your", "menu", "offer", "please",
+    # de
+    "der", "die", "das", "ein", "eine", "es", "gibt", "habt", "ihr", "ist", "kostet", "mit",
+    "preis", "und", "viel", "was", "welche", "wie", "bei", "euch", "karte",
+    # fr / es / it
+    "combien", "coute", "le", "la", "les", "de", "du", "des", "el", "los", "las", "cuanto",
+    "cuesta", "il", "lo", "quanto", "costa", "che", "avete", "tienen",
+}
+
+# canonical section -> aliases (normalized)
+SECTION_ALIASES = {
+    "starters": {"starter", "starters", "appetizer", "appetizers", "vorspeise", "vorspeisen",
+                 "antipasti", "antipasto", "entrees", "entradas"},
+    "mains": {"main", "mains", "hauptgericht", "hauptgerichte", "hauptspeisen", "plats", "secondi"},
+    "desserts": {"dessert", "desserts", "nachspeise", "nachspeisen", "nachtisch", "dolci", "postres",
+                 "sweets"},
+    "drinks": {"drink", "drinks", "beverages", "getranke", "getraenke", "boissons", "bebidas",
+               "bevande"},
+    "sides": {"side", "sides", "beilage", "beilagen", "contorni"},
+    "salads": {"salad", "salads", "salat", "salate", "insalate", "ensaladas"},
+    "pizza": {"pizza", "pizzas", "pizzen"},
+    "pasta": {"pasta", "pastas"},
+    "lunch": {"lunch", "mittag", "mittagstisch", "mittagsmenu", "wochenkarte"},
+}
+_ALIAS_TO_SECTION = {alias: canon for canon, aliases in SECTION_ALIASES.items() for alias in aliases}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, fold umlauts/accents and collapse to ASCII."""
+    text = (text or "").lower().replace("ß", "ss")
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(normalize(text)) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _canonical_section(section: Optional[str]) -> Optional[str]:
+    if not section:
+        return None
+    for tok in TOKEN_RE.findall(normalize(section)):
+        if tok in _ALIAS_TO_SECTION:
+            return _ALIAS_TO_SECTION[tok]
+    return normalize(section).strip(" :-") or None
+
+
+class MenuIndex:
+    def __init__(self, items: List[dict]):
+        self.items = [it for it in items if it.get("name")]
+        self.postings: Dict[str, Set[int]] = {}
+        self.sections: Dict[str, List[int]] = {}
+        for i, it in enumerate(self.items):
+            for tok in set(tokenize(it["name"])):
+                self.postings.setdefault(tok, set()).add(i)
+            canon = _canonical_section(it.get("section"))
+            if canon:
+                self.sections.setdefault(canon, []).append(i)
+        self.vocabulary = list(self.postings)
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.items)
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        if token in self.postings:
+            return [(token, 1.0)]
+        close = difflib.get_close_matches(token, self.vocabulary, n=3, cutoff=FUZZY_CUTOFF)
+        return [(c, difflib.SequenceMatcher(None, token, c).ratio()) for c in close]
+
+    def search(self, query: str, limit: int = 5) -> List[dict]:
+        """Return items whose names best match the query tokens (fuzzy)."""
+        q_tokens = tokenize(query)
+        if not q_tokens or not self.items:
+            return []
+        scores: Dict[int, float] = {}
+        for tok in q_tokens:
+            best: Dict[int, float] = {}
+            for term, weight in self._expand(tok):
+                for i in self.postings[term]:
+                    best[i] = max(best.get(i, 0.0), weight)
+            for i, w in best.items():
+                scores[i] = scores.get(i, 0.0) + w
+
+        min_score = MIN_QUERY_COVERAGE * len(q_tokens)
+        ranked = sorted(
+            (i for i, s in scores.items() if s >= min_score),
+            key=lambda i: (-scores[i], len(self.items[i]["name"])),
+        )
+        if not ranked:
+            return []
+        top = scores[ranked[0]]
+        return [self.items[i] for i in ranked if scores[i] >= top - 1e-6][:limit]
+
+    def section(self, query: str) -> Tuple[Optional[str], List[dict]]:
+        """Return (canonical section, items) for the first section named in the query."""
+        for tok in TOKEN_RE.findall(normalize(query)):
+            canon = _ALIAS_TO_SECTION.get(tok)
+            if canon and canon in self.sections:
+                return canon, [self.items[i] for i in self.sections[canon]]
+        return None, []
+
+
+def format_item(item: dict) -> str:
+    price = f" — {item['price']}" if item.get("price") else ""
+    return f"{item['name']}{price}"
+
+
+_indexes: Dict[str, MenuIndex] = {}
+_lock = threading.Lock()
+
+
+def _coerce_items(raw) -> List[dict]:
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return []
+    return [it for it in raw or [] if isinstance(it, dict)]
+
+
+def build_menu_index(website: str, items) -> MenuIndex:
+    """Build (or rebuild) the menu index for a website and keep it in memory."""
+    index = MenuIndex(_coerce_items(items))
+    with _lock:
+        _indexes[website] = index
+    logger.info("Menu index for %s: %d items, %d sections", website, len(index), len(index.sections))
+    return index
+
+
+def get_menu_index(website: str, load_items: Callable[[], object]) -> MenuIndex:
+    """Return the cached index, rebuilding from `load_items()` when missing or stale."""
+    with _lock:
+        index = _indexes.get(website)
+    if index is not None:
+        ttl = INDEX_TTL_SECONDS if len(index) else EMPTY_INDEX_TTL_SECONDS
+        if time.monotonic() - index.built_at < ttl:
+            cache_event("menu_index", True)
+            return index
+    cache_event("menu_index", False)
+    return build_menu_index(website, load_items())
+
+
+def answer_price(question: str, index: MenuIndex) -> Optional[str]:
+    hits = [it for it in index.search(question) if it.get("price")]
+    if not hits:
+        return None
+    if len(hits) == 1:
+        return f"{hits[0]['name']} costs {hits[0]['price']}"
+    return "Prices: " + "; ".join(format_item(it) for it in hits)
+
+
+def answer_items(question: str, index: MenuIndex, limit: int = 10) -> Optional[str]:
+    # "do you have funghi pizza" names a dish, "what desserts do you have" only a section
+    names_dish = any(t not in _ALIAS_TO_SECTION for t in tokenize(question))
+    hits = index.search(question) if names_dish else []
+    if hits:
+        return "Yes, we have: " + "; ".join(format_item(it) for it in hits)
+    section, items = index.section(question)
+    if items:
+        shown = "; ".join(format_item(it) for it in items[:limit])
+        more = f" (and {len(items) - limit} more)" if len(items) > limit else ""
+        return f"{section.capitalize()}: {shown}{more}"
+    return None
+
+
+def menu_context(question: str, index: MenuIndex, limit: int = 8) -> str:
+    """Compact menu lines relevant to the question, for use as LLM context."""
+    _, items = index.section(question)
+    items = (items or index.search(question, limit=limit))[:limit]
+    if not items:
+        return ""
+    lines = [f"- {it.get('section') or 'Menu'}: {format_item(it)}" for it in items]
+    return "Menu items:\n" + "\n".join(lines)
@@ -0,0 +1,147 @@
+"""
+In-process metrics with Prometheus text exposition, plus per-request stage timings.
+
+`span("stage")` times a block: it feeds the `chatbot_stage_seconds` histogram and,
+inside an HTTP request, the request's timing breakdown (see `start_request_timings`).
+Metrics are per worker process; scrape each worker or run a single worker per pod.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for bound, n in zip(self.buckets, row):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {n}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {row[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {row[-2]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {row[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("chatbot_stage_seconds", "Time spent per pipeline stage.")
+REQUEST_SECONDS = Histogram("chatbot_http_request_seconds", "HTTP request latency.")
+REQUESTS = Counter("chatbot_http_requests_total", "HTTP requests by path and status.")
+LLM_TOKENS = Counter("chatbot_llm_tokens_total", "Tokens used by chat completions.")
+EMBEDDING_CALLS = Counter("chatbot_embedding_requests_total", "Embedding API requests.")
+CACHE_EVENTS = Counter("chatbot_cache_events_total", "Cache / coalescing hits and misses.")
+PAGES = Counter("chatbot_pages_total", "Crawled pages by result.")
+CHUNKS = Counter("chatbot_chunks_total", "Indexed chunks by result.")
+BOILERPLATE_CHARS = Counter("chatbot_boilerplate_chars_total", "Extracted characters kept / stripped as cross-page boilerplate.")
+ADMISSION = Counter("chatbot_admission_total", "/ask admission decisions.")
+PIPELINE_ITEMS = Counter("chatbot_pipeline_items_total", "Items produced by each ingestion pipeline stage.")
+TEACH_ROWS = Counter("chatbot_teach_rows_total", "Taught Q&A rows by result.")
+
+REGISTRY = [
+    STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, LLM_TOKENS,
+    EMBEDDING_CALLS, CACHE_EVENTS, PAGES, CHUNKS, PIPELINE_ITEMS, ADMISSION,
+    BOILERPLATE_CHARS, TEACH_ROWS,
+]
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def cache_event(cache: str, hit: bool):
+    CACHE_EVENTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# --- Per-request timing breakdown ---
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Start collecting stage durations (ms) for the current request context."""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format a breakdown as a `Server-Timing` header value."""
+    return ", ".join(f"{stage.replace('.', '-')};dur={ms:.1f}" for stage, ms in timings.items())
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block as `stage` (histogram + current request breakdown)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
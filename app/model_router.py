@@ -0,0 +1,156 @@
+"""
+Pick the chat model tier for a generation request.
+
+Tiers come from `llm.routing.tiers` in llm_config.yml, cheapest first. A tier is
+used when all of its limits hold (retrieval confidence, context size, question
+length/parts); the last tier takes everything else. Per-tier latency and the
+escalation rate are tracked so the thresholds can be tuned.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from app.config import config
+from app.logger import get_logger
+from app.metrics import LLM_TOKENS, STAGE_SECONDS, span
+
+logger = get_logger("model_router")
+
+PART_SPLIT_RE = re.compile(r"\?|;|\b(?:and also|and what|and how|and when|außerdem|und wie|und was)\b", re.I)
+
+
+def question_parts(question: str) -> int:
+    """Rough count of sub-questions in a message."""
+    return max(1, len([p for p in PART_SPLIT_RE.split(question) if p.strip()]))
+
+
+def _fits(tier: dict, question: str, best_score: float, context_tokens: int) -> bool:
+    if "min_score" in tier and best_score < tier["min_score"]:
+        return False
+    if "max_context_tokens" in tier and context_tokens > tier["max_context_tokens"]:
+        return False
+    if "max_question_words" in tier and len(question.split()) > tier["max_question_words"]:
+        return False
+    if "max_question_parts" in tier and question_parts(question) > tier["max_question_parts"]:
+        return False
+    return True
+
+
+def select_tier(question: str, best_score: float, context_tokens: int) -> dict:
+    """Return the first (cheapest) tier whose limits the request satisfies."""
+    tiers: List[dict] = config.LLM_TIERS
+    for tier in tiers[:-1]:
+        if _fits(tier, question, best_score, context_tokens):
+            return tier
+    return tiers[-1]
+
+
+class TierStats:
+    """Thread-safe per-tier latency and escalation counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self.max_seconds: Dict[str, float] = {}
+        self.requests = 0
+        self.escalated = 0
+
+    def record_call(self, tier: str, seconds: float):
+        with self._lock:
+            self.calls[tier] = self.calls.get(tier, 0) + 1
+            self.seconds[tier] = self.seconds.get(tier, 0.0) + seconds
+            self.max_seconds[tier] = max(self.max_seconds.get(tier, 0.0), seconds)
+
+    def record_request(self, escalated: bool):
+        with self._lock:
+            self.requests += 1
+            if escalated:
+                self.escalated += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "escalationRate": round(self.escalated / self.requests, 4) if self.requests else 0.0,
+                "tiers": {
+                    name: {
+                        "calls": n,
+                        "avgMs": round(self.seconds[name] / n * 1000, 1),
+                        "maxMs": round(self.max_seconds[name] * 1000, 1),
+                    }
+                    for name, n in self.calls.items()
+                },
+            }
+
+
+stats = TierStats()
+
+
+def _record_usage(tier: dict, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, tier=tier["name"], kind="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, tier=tier["name"], kind="completion")
+
+
+def _complete(openai_client, tier: dict, messages: List[dict]) -> str:
+    start = time.perf_counter()
+    try:
+        with span(f"generate.{tier['name']}"):
+            resp = openai_client.chat.completions.create(model=tier["model"], messages=messages)
+    finally:
+        stats.record_call(tier["name"], time.perf_counter() - start)
+    _record_usage(tier, resp.usage)
+    return (resp.choices[0].message.content or "").strip()
+
+
+def complete_cheapest(openai_client, messages: List[dict]) -> str:
+    """One completion on the cheapest tier (housekeeping prompts, not answers)."""
+    return _complete(openai_client, config.LLM_TIERS[0], messages)
+
+
+def generate(openai_client, messages: List[dict], question: str, best_score: float, context_tokens: int) -> str:
+    """
+    Run the completion on the selected tier. An empty answer from a cheaper
+    tier is retried once on the largest tier.
+    """
+    tiers = config.LLM_TIERS
+    tier = select_tier(question, best_score, context_tokens)
+    escalated = tier is not tiers[0]
+    answer = _complete(openai_client, tier, messages)
+    if not answer and tier is not tiers[-1]:
+        logger.info("Tier %s returned nothing; escalating to %s", tier["name"], tiers[-1]["name"])
+        escalated = True
+        answer = _complete(openai_client, tiers[-1], messages)
+    stats.record_request(escalated)
+    logger.info(
+        "Generated with tier=%s score=%.2f context_tokens=%d", tier["name"], best_score, context_tokens
+    )
+    return answer
+
+
+def generate_stream(openai_client, messages: List[dict], question: str, best_score: float, context_tokens: int) -> Iterator[str]:
+    """Streaming variant of `generate`: yields text deltas from the selected tier."""
+    tiers = config.LLM_TIERS
+    tier = select_tier(question, best_score, context_tokens)
+    stats.record_request(tier is not tiers[0])
+    start = time.perf_counter()
+    try:
+        events = openai_client.chat.completions.create(
+            model=tier["model"],
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for event in events:
+            _record_usage(tier, getattr(event, "usage", None))
+            delta = event.choices[0].delta.content if event.choices else None
+            if delta:
+                yield delta
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.record_call(tier["name"], elapsed)
+        STAGE_SECONDS.observe(elapsed, stage=f"generate.{tier['name']}")
@@ -0,0 +1,17 @@
+import threading
+
+from app.config import config
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_openai():
+    """Lazy-init the shared OpenAI client (the SDK import itself is slow)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=config.OPENAI_API_KEY)
+    return _client
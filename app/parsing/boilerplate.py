@@ -0,0 +1,134 @@
+"""
+Cross-page boilerplate removal.
+
+Paragraphs are fingerprinted across all docs of one crawl: an exact hash of
+the normalized text, plus a MinHash signature over word shingles (LSH-banded)
+for near-identical blocks such as a footer with a changing date. The first
+occurrence of a block is kept as its canonical copy and later copies are
+stripped, so opening hours or the allergen note are indexed once instead of
+once per page.
+
+The filter is streaming: docs are processed in crawl order and only
+fingerprints are kept, never page text.
+"""
+
+import hashlib
+import re
+import threading
+from typing import Dict, List, Optional, Set
+
+from app.metrics import BOILERPLATE_CHARS, span
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+MIN_WORDS_EXACT = 3       # shorter lines (headings, prices) are always kept
+MIN_WORDS_NEAR = 8        # near-duplicate matching needs enough shingles
+SHINGLE_SIZE = 3
+NUM_HASHES = 64
+BANDS = 16                # 16 bands x 4 rows: ~0.8 Jaccard pairs collide with p > 0.9
+ROWS = NUM_HASHES // BANDS
+NEAR_DUPLICATE = 0.8      # estimated Jaccard at which a block counts as a repeat
+
+# Random masks turn one 64-bit shingle hash into NUM_HASHES min-wise hashes
+# (XOR is much cheaper than (a*h + b) mod p in Python and good enough here)
+_MASKS = [
+    int.from_bytes(hashlib.blake2b(f"minhash-{i}".encode(), digest_size=8).digest(), "big")
+    for i in range(NUM_HASHES)
+]
+_MASK64 = (1 << 64) - 1
+
+
+def _shingle_hashes(words: List[str]) -> Set[int]:
+    # Built-in str hash: fingerprints only need to agree within one process/crawl
+    return {
+        hash(" ".join(words[i:i + SHINGLE_SIZE])) & _MASK64
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(words: List[str]) -> List[int]:
+    hashes = _shingle_hashes(words)
+    return [min(h ^ m for h in hashes) for m in _MASKS]
+
+
+def _similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_HASHES
+
+
+class BoilerplateFilter:
+    """
+    One instance per crawl of one website; `strip(text)` for each doc in crawl
+    order. Thread-safe, but feed docs from a single stage to keep the
+    canonical copy deterministic.
+    """
+
+    def __init__(self, near_duplicate: float = NEAR_DUPLICATE):
+        self.near_duplicate = near_duplicate
+        self._lock = threading.Lock()
+        self._exact: Set[bytes] = set()
+        self._signatures: List[List[int]] = []
+        self._buckets: Dict[tuple, List[int]] = {}
+        self.kept_chars = 0
+        self.stripped_chars = 0
+        self.stripped_blocks = 0
+
+    def _near_match(self, sig: List[int]) -> Optional[int]:
+        for band in range(BANDS):
+            key = (band, tuple(sig[band * ROWS:(band + 1) * ROWS]))
+            for idx in self._buckets.get(key, ()):
+                if _similarity(sig, self._signatures[idx]) >= self.near_duplicate:
+                    return idx
+        return None
+
+    def _remember(self, sig: List[int]):
+        idx = len(self._signatures)
+        self._signatures.append(sig)
+        for band in range(BANDS):
+            key = (band, tuple(sig[band * ROWS:(band + 1) * ROWS]))
+            self._buckets.setdefault(key, []).append(idx)
+
+    def _is_repeat(self, paragraph: str) -> bool:
+        words = WORD_RE.findall(paragraph.lower())
+        if len(words) < MIN_WORDS_EXACT:
+            return False
+        digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+        sig = minhash(words) if len(words) >= MIN_WORDS_NEAR else None
+        with self._lock:
+            if digest in self._exact:
+                return True
+            self._exact.add(digest)
+            if sig is None:
+                return False
+            if self._near_match(sig) is not None:
+                return True
+            self._remember(sig)
+            return False
+
+    @span("index.boilerplate")
+    def strip(self, text: str) -> str:
+        """Drop paragraphs already seen (exactly or nearly) earlier in this crawl."""
+        kept = []
+        stripped = 0
+        for paragraph in text.split("\n"):
+            if paragraph.strip() and self._is_repeat(paragraph):
+                stripped += len(paragraph)
+                with self._lock:
+                    self.stripped_blocks += 1
+                continue
+            kept.append(paragraph)
+        result = "\n".join(kept).strip()
+        with self._lock:
+            self.kept_chars += len(result)
+            self.stripped_chars += stripped
+        BOILERPLATE_CHARS.inc(len(result), result="kept")
+        BOILERPLATE_CHARS.inc(stripped, result="stripped")
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.kept_chars + self.stripped_chars
+            return {
+                "strippedBlocks": self.stripped_blocks,
+                "strippedChars": self.stripped_chars,
+                "strippedRatio": round(self.stripped_chars / total, 4) if total else 0.0,
+            }
@@ -2,7 +2,10 @@ import re
 import json
 from bs4 import BeautifulSoup
 
+from app.metrics import span
 
+
+@span("parse.jsonld")
 def extract_jsonld_profiles(html: str) -> list[dict]:
     soup = BeautifulSoup(html, "html.parser")
     profiles = []
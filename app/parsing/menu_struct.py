@@ -6,6 +6,8 @@ Handles simple 'Name ... €12.90' patterns and section headers.
 import re
 from typing import List, Dict
 
+from app.metrics import span
+
 PRICE_RE = re.compile(
     r"(?P<price>\d{1,3}(?:[.,]\d{1,2})?)\s?(?:€|eur|euro)?",
     re.IGNORECASE,
@@ -24,6 +26,7 @@ def _looks_like_section(line: str) -> bool:
     return bool(SECTION_HINT_RE.match(line.strip()))
 
 
+@span("parse.menu_structure")
 def structure_menu(text: str) -> List[Dict]:
     """
     Given raw menu text, return a list of items:
@@ -1,17 +1,17 @@
 """
 Helpers to fetch a menu file and extract text from PDFs or images.
-Requires: requests, pdfplumber, pillow, pytesseract
+Requires: requests, pdfplumber, pillow, pytesseract (the last three load on first use)
 """
 
 import io
 from typing import Tuple
 
-import pdfplumber
 import requests
-from PIL import Image
-import pytesseract
 
+from app.metrics import span
 
+
+@span("parse.fetch")
 def fetch_bytes(url: str, timeout: int = 20) -> Tuple[bytes, str]:
     """
     Download a URL and return (bytes, content_type).
@@ -22,8 +22,11 @@ def fetch_bytes(url: str, timeout: int = 20) -> Tuple[bytes, str]:
     return r.content, (r.headers.get("content-type") or "").lower()
 
 
+@span("parse.pdf")
 def parse_pdf(pdf_bytes: bytes) -> str:
     """Extract text from a PDF (best-effort)."""
+    import pdfplumber
+
     parts = []
     with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
         for page in pdf.pages:
@@ -32,8 +35,12 @@ def parse_pdf(pdf_bytes: bytes) -> str:
     return "\n".join(parts).strip()
 
 
+@span("parse.ocr")
 def parse_image(img_bytes: bytes) -> str:
     """OCR an image using Tesseract (auto language)."""
+    from PIL import Image
+    import pytesseract
+
     img = Image.open(io.BytesIO(img_bytes))
     # You can pass lang="eng+deu" if you installed those packs
     return pytesseract.image_to_string(img)
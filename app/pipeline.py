@@ -0,0 +1,434 @@
+"""
+Streaming ingestion: fetch → extract → order → boilerplate → chunk → embed → write
+(embeddings and writes in batches).
+
+Each stage runs in its own thread(s) and hands items to the next through a
+bounded queue, so network, CPU and API time overlap (page 1 is being embedded
+while page 20 is fetched) and a slow stage backs up the ones before it instead
+of buffering the whole site. Memory stays flat at roughly
+`queue_size` items per stage regardless of site size.
+
+A stage is a function from an iterator of inputs to an iterator of outputs, so
+filtering, fan-out (page → chunks) and batching are all plain generators.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.config import config
+from app.logger import get_logger, with_correlation
+from app.metrics import CHUNKS, PIPELINE_ITEMS, cache_event, span
+from app.vectorizer import hash_text, chunk_text, embed_shared
+from app.weaviate_client import batch_write, get_client
+
+logger = get_logger("pipeline")
+
+QUEUE_SIZE = 16
+EMBED_BATCH = 64          # chunks per embeddings request
+WRITE_BATCH = 100         # objects per Weaviate batch
+VECTOR_CACHE_SIZE = 1024  # recent chunk vectors kept for reuse
+
+_DONE = object()
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0     # seconds producing outputs, excluding input waits
+        self.starved = 0.0  # seconds waiting for input
+        self.blocked = 0.0  # seconds waiting for room downstream (backpressure)
+        self.lock = threading.Lock()
+
+    def add(self, items: int, busy: float, blocked: float):
+        with self.lock:
+            self.items += items
+            self.busy += busy
+            self.blocked += blocked
+        PIPELINE_ITEMS.inc(items, stage=self.name)
+
+    def wait(self, seconds: float):
+        with self.lock:
+            self.starved += seconds
+            self.busy -= seconds
+
+    def snapshot(self, elapsed: float) -> dict:
+        return {
+            "items": self.items,
+            "perSecond": round(self.items / elapsed, 2) if elapsed else 0.0,
+            "busySeconds": round(self.busy, 3),
+            "starvedSeconds": round(self.starved, 3),
+            "blockedSeconds": round(self.blocked, 3),
+        }
+
+
+class ChunkFailures:
+    """Chunks dropped by the embed/write stages; a failed batch never stops the run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_stage: Dict[str, int] = {}
+
+    def add(self, stage: str, count: int, error):
+        with self.lock:
+            self.by_stage[stage] = self.by_stage.get(stage, 0) + count
+        CHUNKS.inc(count, result="failed")
+        logger.warning("Chunk %s failed for %d chunks: %s", stage, count, error)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.by_stage)
+
+
+class Pipeline:
+    """
+    Pipeline(source).stage("extract", fn, workers=2).stage(...).run()
+
+    `source` is iterated in its own thread (reported as `source_name`). A stage
+    yielding lists counts each element as an item. The last stage's outputs are
+    discarded, so it should do the final side effect (e.g. writing to Weaviate).
+    """
+
+    def __init__(self, source: Iterable, source_name: str = "source", queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._stages = [(source_name, lambda _: iter(source), 1)]
+        self._cancel = threading.Event()
+        self._errors: List[BaseException] = []
+        self.stats: Dict[str, StageStats] = {}
+        self.failures = ChunkFailures()
+
+    def stage(self, name: str, fn: Callable[[Iterator], Iterator], workers: int = 1) -> "Pipeline":
+        self._stages.append((name, fn, workers))
+        return self
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    # --- queue helpers that give up when the pipeline is cancelled ---
+
+    def _put(self, q: queue.Queue, item):
+        while not self._cancel.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise PipelineCancelled()
+
+    def _drain(self, q: queue.Queue, stats: StageStats) -> Iterator:
+        while True:
+            start = time.perf_counter()
+            while True:
+                try:
+                    item = q.get(timeout=0.1)
+                    break
+                except queue.Empty:
+                    if self._cancel.is_set():
+                        raise PipelineCancelled()
+            stats.wait(time.perf_counter() - start)
+            if item is _DONE:
+                q.put(_DONE)  # let sibling workers see the end too
+                return
+            yield item
+
+    def _worker(self, name: str, fn, inq: Optional[queue.Queue], outq: Optional[queue.Queue], remaining: list):
+        stats = self.stats[name]
+        try:
+            outputs = fn(self._drain(inq, stats) if inq is not None else None)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(outputs)
+                except StopIteration:
+                    break
+                produced = time.perf_counter()
+                if outq is not None:
+                    self._put(outq, item)
+                stats.add(len(item) if isinstance(item, list) else 1,
+                          produced - start, time.perf_counter() - produced)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            logger.error("Pipeline stage %s failed: %s", name, e)
+            self._errors.append(e)
+            self._cancel.set()
+        finally:
+            with stats.lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and outq is not None:
+                try:
+                    self._put(outq, _DONE)
+                except PipelineCancelled:
+                    pass
+
+    def run(self) -> dict:
+        """Run to completion; re-raises the first stage error."""
+        started = time.perf_counter()
+        threads = []
+        inq = None
+        for i, (name, fn, workers) in enumerate(self._stages):
+            last = i == len(self._stages) - 1
+            outq = None if last else queue.Queue(maxsize=self.queue_size)
+            self.stats[name] = StageStats(name)
+            remaining = [workers]
+            for n in range(workers):
+                threads.append(threading.Thread(
+                    target=with_correlation(self._worker), args=(name, fn, inq, outq, remaining),
+                    name=f"pipeline-{name}-{n}", daemon=True,
+                ))
+            inq = outq
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self._errors:
+            raise self._errors[0]
+
+        elapsed = time.perf_counter() - started
+        return {
+            "seconds": round(elapsed, 3),
+            "stages": {name: s.snapshot(elapsed) for name, s in self.stats.items()},
+            "failedChunks": self.failures.snapshot(),
+        }
+
+
+class DocLimit:
+    """
+    Caps a crawl at `limit` docs with content, counted after extraction (and
+    boilerplate stripping), so PDFs or pages that extract to nothing do not use
+    up the limit. Pages between the fetch and the counting stage are in flight;
+    the source only fetches another page while the ones in flight could not
+    already reach the limit.
+
+        limit.pages(source, cancelled)  # source stage
+        limit.drop()                    # a page produced no doc
+        limit.take(docs)                # counting stage: passes the first `limit` docs
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.kept = 0
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def pages(self, source: Iterable, cancelled: Callable[[], bool]) -> Iterator:
+        pages = iter(source)
+        while True:
+            with self._cond:
+                while self.kept < self.limit and self.kept + self.in_flight >= self.limit:
+                    if cancelled():
+                        return
+                    self._cond.wait(0.1)
+                if self.kept >= self.limit:
+                    return
+                self.in_flight += 1
+            page = next(pages, None)
+            if page is None:
+                return
+            yield page
+
+    def drop(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def take(self, docs: Iterator[dict]) -> Iterator[dict]:
+        for doc in docs:
+            with self._cond:
+                self.in_flight -= 1
+                keep = self.kept < self.limit
+                if keep:
+                    self.kept += 1
+                self._cond.notify_all()
+            if keep:
+                yield doc
+
+
+# --- Ingestion stages ---
+
+def _chunk_stage(website: str):
+    def run(docs: Iterator[dict]) -> Iterator[dict]:
+        for doc in docs:
+            for idx, chunk in enumerate(chunk_text(doc["text"])):
+                yield {
+                    "text": chunk,
+                    "source": doc["url"],
+                    "website": website,
+                    "title": doc.get("title"),
+                    "section": f"chunk-{idx}",
+                    "contentType": "text/html",
+                    "fetchedAt": doc.get("fetchedAt"),
+                    "hash": hash_text(chunk),
+                }
+    return run
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _in_order(items: Iterator[tuple]) -> Iterator:
+    """
+    Re-sequence (seq, item) pairs coming from parallel workers and yield the
+    items in seq order. Every seq from 0 up must arrive (use a placeholder for
+    dropped items); only the items ahead of a missing one are buffered.
+    """
+    pending = {}
+    next_seq = 0
+    for seq, item in items:
+        pending[seq] = item
+        while next_seq in pending:
+            yield pending.pop(next_seq)
+            next_seq += 1
+
+
+def _embed_stage(batch_size: int, failures: ChunkFailures):
+    # chunk hash -> vector for repeated chunks (nav/footer text); bounded so
+    # memory stays flat on large sites
+    vectors: "OrderedDict[str, list]" = OrderedDict()
+    lock = threading.Lock()
+
+    def run(chunks: Iterator[dict]) -> Iterator[list]:
+        for batch in _batches(chunks, batch_size):
+            found = {}
+            with lock:
+                for c in batch:
+                    vec = vectors.get(c["hash"])
+                    cache_event("chunk_vectors", vec is not None)
+                    if vec is not None:
+                        found[c["hash"]] = vec
+            missing = list({c["hash"]: c["text"] for c in batch if c["hash"] not in found}.items())
+            if missing:
+                try:
+                    # shared with concurrent index runs and the other embed workers
+                    fresh = embed_shared([text for _, text in missing])
+                except Exception as e:  # rate limit / API error: drop this batch, keep indexing
+                    failures.add("embed", len(batch), e)
+                    continue
+                with lock:
+                    for (h, _), vec in zip(missing, fresh):
+                        found[h] = vectors[h] = vec
+                    while len(vectors) > VECTOR_CACHE_SIZE:
+                        vectors.popitem(last=False)
+            yield [(c, found[c["hash"]]) for c in batch]
+    return run
+
+
+def _write_stage(batch_size: int, failures: ChunkFailures):
+    def run(embedded: Iterator[list]) -> Iterator[list]:
+        client = get_client()
+        for rows in _batches((row for batch in embedded for row in batch), batch_size):
+            _write(client, rows, failures)
+            yield rows
+    return run
+
+
+def _write(client, rows: list, failures: ChunkFailures) -> int:
+    try:
+        with span("index.write"):
+            errors = batch_write(client, "WebContent", ((None, props, vec) for props, vec in rows), len(rows))
+    except Exception as e:
+        failures.add("write", len(rows), e)
+        return 0
+    CHUNKS.inc(len(rows) - len(errors), result="ok")
+    if errors:
+        failures.add("write", len(errors), errors[0])
+    return len(rows) - len(errors)
+
+
+def upload_pipeline(docs: Iterable[dict], website: str, source_name: str = "docs",
+                    embed_workers: int = 2) -> Pipeline:
+    """Chunk → embed → write stages over a stream of docs."""
+    pipeline = Pipeline(docs, source_name=source_name, queue_size=config.PIPELINE_QUEUE_SIZE)
+    return (
+        pipeline
+        .stage("chunk", _chunk_stage(website))
+        .stage("embed", _embed_stage(EMBED_BATCH, pipeline.failures), workers=embed_workers)
+        .stage("write", _write_stage(WRITE_BATCH, pipeline.failures))
+    )
+
+
+def index_website(website: str, limit: int = 10) -> dict:
+    """
+    Crawl, extract, chunk, embed and store a website as one streaming pipeline,
+    then detect its BusinessProfile. Returns page/chunk counts and per-stage
+    throughput.
+    """
+    # Parsing dependencies (trafilatura, pdfplumber, OCR) only load on the indexing path
+    from app.parsing.boilerplate import BoilerplateFilter
+    from app.website_loader import AddressFallback, detect_and_store_site_profile, iter_pages, page_to_doc
+
+    addresses = AddressFallback()
+    boilerplate = BoilerplateFilter()
+    doc_limit = DocLimit(limit)
+
+    def extract(pages: Iterator[tuple]) -> Iterator[tuple]:
+        # (fetch index, doc or None): pages without content pass too, so no index goes missing
+        for seq, page in pages:
+            doc = page_to_doc(page)
+            if doc:
+                addresses.add(doc["url"], doc["text"])  # footers often hold the address
+            yield seq, doc
+
+    def in_crawl_order(pages: Iterator[tuple]) -> Iterator[dict]:
+        # The extract workers finish pages out of order; boilerplate and the limit need crawl order
+        for doc in _in_order(pages):
+            if doc:
+                yield doc
+            else:
+                doc_limit.drop()
+
+    def strip_boilerplate(docs: Iterator[dict]) -> Iterator[dict]:
+        # Single worker in crawl order: the first page a block appears on keeps it
+        for doc in docs:
+            doc["text"] = boilerplate.strip(doc["text"])
+            if doc["text"]:
+                yield doc
+            else:
+                doc_limit.drop()
+
+    # `limit` counts docs with content, like crawl_website
+    pipeline = Pipeline(
+        enumerate(doc_limit.pages(iter_pages(website), lambda: pipeline.cancelled)),
+        source_name="fetch", queue_size=config.PIPELINE_QUEUE_SIZE,
+    )
+    pipeline.stage("extract", extract, workers=config.PIPELINE_EXTRACT_WORKERS)
+    pipeline.stage("order", in_crawl_order)
+    if config.STRIP_BOILERPLATE:
+        pipeline.stage("boilerplate", strip_boilerplate)
+    pipeline.stage("limit", doc_limit.take)
+    pipeline.stage("chunk", _chunk_stage(website))
+    pipeline.stage("embed", _embed_stage(EMBED_BATCH, pipeline.failures), workers=config.PIPELINE_EMBED_WORKERS)
+    pipeline.stage("write", _write_stage(WRITE_BATCH, pipeline.failures))
+    try:
+        with span("index.pipeline"):
+            report = pipeline.run()
+    finally:
+        # The profile comes from the homepage and the addresses seen so far,
+        # so it is stored even if the crawl itself failed
+        detect_and_store_site_profile(website, addresses)
+    report["pages"] = doc_limit.kept
+    if config.STRIP_BOILERPLATE:
+        report["boilerplate"] = boilerplate.stats()
+    logger.info(
+        "Indexed %s: %d pages, %d chunks (%d failed) in %ss",
+        website, report["pages"], report["stages"]["chunk"]["items"],
+        sum(report["failedChunks"].values()), report["seconds"],
+    )
+    return report
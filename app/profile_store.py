@@ -52,4 +52,4 @@ def upsert_business_profile(profile: dict):
             client.data_object.create(payload, class_name="BusinessProfile", uuid=obj_id)
             logger.info("BusinessProfile created.")
     except Exception as e:
-        logger.warning(f"Profile upsert failed: {e}")
+        logger.warning("Profile upsert failed: %s", e)
@@ -0,0 +1,237 @@
+"""
+Conversation sessions for multi-turn /ask.
+
+Each session keeps a rolling summary plus the most recent turns. When the
+history grows past `sessions.history_tokens`, the oldest turns are folded into
+the summary by the cheapest generation tier (in a background thread, so the
+answer is not delayed). Sessions expire after `sessions.ttl_seconds` idle and
+the least recently used ones are evicted when the store exceeds its session
+count or byte budget. The store is per worker process.
+
+Follow-up questions ("and on weekends?") are rewritten into standalone questions
+before the fast path, the answer caches and retrieval see them.
+"""
+
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.admission import Rejected, admission
+from app.config import config
+from app.context_builder import count_tokens, truncate_tokens
+from app.logger import get_logger, with_correlation
+from app.metrics import cache_event, span
+from app.model_router import complete_cheapest
+from app.openai_client import get_openai
+
+logger = get_logger("sessions")
+
+MAX_SESSION_ID_LENGTH = 64
+# Follow-ups that only make sense with earlier turns (en/de/fr/es/it): a leading
+# continuation ("and on weekends?", "what about parking?") ...
+LEADING_FOLLOW_UP_RE = re.compile(
+    r"^\s*(?:and|also|but|what about|how about|und|auch|aber|was ist mit|wie ist es mit|"
+    r"et|mais|et pour|y|pero|y qué tal|e|ma|e per|e invece)\b",
+    re.IGNORECASE,
+)
+# ... a pronoun standing in for something named earlier ("is it vegan?", "do
+# they have that one?"); "there" and "that" are left out on their own because
+# "is there parking?" and "dishes that are vegan" are standalone ...
+ANAPHORA_RE = re.compile(
+    r"\b(?:it|its|they|them|their|those|these|that one|this one|the same|"
+    r"(?:is|are|was|does|do|can) (?:that|this)|"
+    r"davon|dafür|dabei|ça|cela|eso|esos|quello|quelli)\b",
+    re.IGNORECASE,
+)
+# ... or a short fragment starting with a preposition ("on weekends?", "for kids?")
+FRAGMENT_RE = re.compile(
+    r"^\s*(?:on|at|in|for|with|without|during|am|an|im|für|mit|ohne|pour|avec|"
+    r"en|para|con|por|per|di)\b",
+    re.IGNORECASE,
+)
+MAX_FRAGMENT_WORDS = 4
+
+REWRITE_PROMPT = (
+    "Rewrite the user's last message as a standalone question that can be understood "
+    "without the conversation. Keep its language. Return only the question."
+)
+SUMMARY_PROMPT = (
+    "Update the running summary of a customer conversation with a business's website "
+    "assistant. Keep facts the user asked about and the answers given; drop pleasantries. "
+    "Write at most {words} words. Return only the summary."
+)
+
+
+class Session:
+    def __init__(self, session_id: str, website: str):
+        self.id = session_id
+        self.website = website
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []  # (question, answer), oldest first
+        self.touched = time.monotonic()
+        self.summarizing = False
+        self.lock = threading.Lock()
+
+    def size(self) -> int:
+        """Approximate bytes held (text only)."""
+        return len(self.summary) + sum(len(q) + len(a) for q, a in self.turns)
+
+    def transcript(self, turns: Optional[List[Tuple[str, str]]] = None) -> str:
+        lines = [f"Summary: {self.summary}"] if self.summary else []
+        for q, a in self.turns if turns is None else turns:
+            lines.append(f"User: {q}\nAssistant: {a}")
+        return "\n".join(lines)
+
+
+class SessionStore:
+    """TTL + LRU store bounded by session count and total bytes."""
+
+    def __init__(self, ttl: float, max_sessions: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size()
+
+    def _sweep(self, now: float):
+        # Least recently used first, so expired sessions sit at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.touched < self.ttl:
+                break
+            self._drop(oldest.id)
+            self.expired += 1
+
+    def _enforce_limits(self):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions)))
+            self.evicted += 1
+
+    def resume(self, session_id: Optional[str], website: str) -> Session:
+        """Return the caller's live session for `website`, or start a new one."""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            known = session_id and len(session_id) <= MAX_SESSION_ID_LENGTH
+            session = self._sessions.get(session_id) if known else None
+            hit = session is not None and session.website == website
+            cache_event("session", hit)
+            if not hit:
+                # Ids are always issued here, never adopted from the client
+                session = Session(secrets.token_urlsafe(16), website)
+                self._sessions[session.id] = session
+                self._enforce_limits()
+            session.touched = now
+            self._sessions.move_to_end(session.id)
+            return session
+
+    def resize(self, session: Session, delta: int):
+        with self._lock:
+            if session.id in self._sessions:
+                self._bytes += delta
+                self._enforce_limits()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+store = SessionStore(config.SESSION_TTL_SECONDS, config.SESSION_MAX_SESSIONS, config.SESSION_MAX_BYTES)
+
+
+def is_follow_up(question: str) -> bool:
+    """True only for questions that cannot be understood without earlier turns."""
+    if LEADING_FOLLOW_UP_RE.search(question) or ANAPHORA_RE.search(question):
+        return True
+    return len(question.split()) <= MAX_FRAGMENT_WORDS and bool(FRAGMENT_RE.search(question))
+
+
+def standalone_question(session: Session, question: str) -> str:
+    """
+    Rewrite a follow-up into a self-contained question (unchanged otherwise).
+    The model call takes an admission slot; `Rejected` propagates to the caller.
+    """
+    with session.lock:
+        if not session.turns and not session.summary:
+            return question
+        history = session.transcript(session.turns[-config.SESSION_KEEP_TURNS:])
+    if not is_follow_up(question):
+        return question
+    try:
+        with admission.admit(session.website), span("ask.rewrite"):
+            rewritten = complete_cheapest(get_openai(), [
+                {"role": "system", "content": REWRITE_PROMPT},
+                {"role": "user", "content": f"{history}\n\nLast message: {question}"},
+            ])
+    except Rejected:
+        raise
+    except Exception as e:
+        logger.warning("Follow-up rewrite failed, using the question as asked: %s", e)
+        return question
+    rewritten = rewritten.strip().strip('"') or question
+    logger.info("Rewrote follow-up %r -> %r", question, rewritten)
+    return rewritten
+
+
+def record_turn(session: Session, question: str, answer: str):
+    """Append a turn; fold old turns into the summary once over the token budget."""
+    # Verbatim turns share half the budget, the summary gets the other half
+    per_turn = config.SESSION_HISTORY_TOKENS // (2 * max(1, config.SESSION_KEEP_TURNS))
+    question = truncate_tokens(question, per_turn // 2)
+    answer = truncate_tokens(answer, per_turn)
+    with session.lock:
+        before = session.size()
+        session.turns.append((question, answer))
+        delta = session.size() - before
+        over_budget = count_tokens(session.transcript()) > config.SESSION_HISTORY_TOKENS
+        fold = len(session.turns) > config.SESSION_KEEP_TURNS and over_budget and not session.summarizing
+        if fold:
+            session.summarizing = True
+    store.resize(session, delta)
+    if fold:
+        threading.Thread(target=with_correlation(_summarize), args=(session,), name="session-summary", daemon=True).start()
+
+
+def _summarize(session: Session):
+    with session.lock:
+        n = len(session.turns) - config.SESSION_KEEP_TURNS
+        old_turns = session.turns[:n]
+        previous = session.summary
+    budget = config.SESSION_HISTORY_TOKENS // 2
+    folded = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in old_turns)
+    try:
+        with span("session.summarize"):
+            summary = complete_cheapest(get_openai(), [
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=max(20, budget * 3 // 4))},
+                {"role": "user", "content": f"Summary so far: {previous or '-'}\n\n{folded}"},
+            ])
+    except Exception as e:
+        logger.warning("Session summary failed, keeping the latest part of the transcript: %s", e)
+        summary = ""
+    if not summary:
+        tail = f"{previous}\n{folded}".strip()[-budget * 8:]
+        summary = tail
+    summary = truncate_tokens(summary, budget)
+
+    with session.lock:
+        before = session.size()
+        session.summary = summary
+        del session.turns[:n]  # turns are only appended, so these are still the folded ones
+        session.summarizing = False
+        delta = session.size() - before
+    store.resize(session, delta)
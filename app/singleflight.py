@@ -0,0 +1,211 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight computation:
+the first caller runs it, the others block until it finishes and receive the
+same result (or exception). `stream` does the same for iterators: every
+caller replays the chunks produced so far and then follows the live output.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List
+
+from app.logger import get_logger, with_correlation
+from app.metrics import cache_event
+
+logger = get_logger("singleflight")
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case/whitespace/trailing-punctuation insensitive form used in keys."""
+    return _WS_RE.sub(" ", question.strip().lower()).rstrip(" ?!.")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class _Broadcast:
+    """Buffers chunks from one producer thread for any number of readers."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: List = []
+        self.finished = False
+        self.error: BaseException | None = None
+        # set once the leader's source is running, or failed to start (start_error)
+        self.started = threading.Event()
+        self.start_error: BaseException | None = None
+
+    def pump(self, source: Iterable, on_done: Callable[[], None]):
+        try:
+            for chunk in source:
+                with self.cond:
+                    self.chunks.append(chunk)
+                    self.cond.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            on_done()
+            with self.cond:
+                self.finished = True
+                self.cond.notify_all()
+
+    def fail_start(self, error: BaseException):
+        """End the stream without output; readers and waiting joiners raise `error`."""
+        with self.cond:
+            self.error = self.start_error = error
+            self.finished = True
+            self.cond.notify_all()
+        self.started.set()
+
+    def reader(self) -> Iterator:
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.chunks) and not self.finished:
+                    self.cond.wait()
+                if i < len(self.chunks):
+                    chunk = self.chunks[i]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            i += 1
+            yield chunk
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable):
+        """Run `fn()` once per key among concurrent callers and share its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+            cache_event(f"singleflight_{self.name}", not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                logger.info("%s: shared one result with %d waiting callers", self.name, call.waiters)
+        return call.result
+
+    def do_batch(self, keys: List[Hashable], fn: Callable[[List[Hashable]], List]) -> List:
+        """
+        `do` for many keys at once: keys no one else is computing are passed to
+        a single `fn(keys)` call, which returns their results in the same order;
+        keys already in flight (in `do` or another batch) wait for their leader.
+        Returns one result per key, in order.
+        """
+        calls: Dict[Hashable, _Call] = {}
+        lead: List[Hashable] = []
+        with self._lock:
+            for key in keys:
+                if key in calls:
+                    continue
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    lead.append(key)
+                else:
+                    call.waiters += 1
+                    self.coalesced += 1
+                calls[key] = call
+                cache_event(f"singleflight_{self.name}", not leader)
+
+        if lead:
+            try:
+                for key, result in zip(lead, fn(lead)):
+                    calls[key].result = result
+            except BaseException as e:
+                for key in lead:
+                    calls[key].error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in lead:
+                        self._calls.pop(key, None)
+                for key in lead:
+                    calls[key].done.set()
+
+        for call in calls.values():
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+        return [calls[key].result for key in keys]
+
+    def stream(self, key: Hashable, make_iter: Callable[[], Iterable]) -> Iterator:
+        """
+        Return an iterator over the shared output of `make_iter()` for this key.
+        Only the caller that starts the stream calls `make_iter()`, in its own
+        thread, so it can still fail before a response is sent. Joiners wait
+        until it has returned: if it raised, they raise the same error instead
+        of returning an iterator. The source is then drained by a background
+        thread, so a disconnecting client does not cut the stream short for the
+        others.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            joined = broadcast is not None
+            if not joined:
+                broadcast = self._streams[key] = _Broadcast()
+            else:
+                self.coalesced += 1
+            cache_event(f"singleflight_{self.name}_stream", joined)
+        if joined:
+            broadcast.started.wait()
+            if broadcast.start_error is not None:
+                raise broadcast.start_error
+            return broadcast.reader()
+
+        try:
+            source = make_iter()
+            threading.Thread(
+                target=with_correlation(broadcast.pump),
+                args=(source, lambda: self._end_stream(key, broadcast)),
+                name=f"{self.name}-stream",
+                daemon=True,
+            ).start()
+        except BaseException as e:
+            self._end_stream(key, broadcast)
+            broadcast.fail_start(e)
+            raise
+        broadcast.started.set()
+        return broadcast.reader()
+
+    def _end_stream(self, key: Hashable, broadcast: _Broadcast):
+        with self._lock:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
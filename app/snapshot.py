@@ -0,0 +1,261 @@
+"""
+Portable per-website snapshots of the index (no re-crawl or re-embedding needed).
+
+File layout (little-endian):
+
+    "CBSNAP01" + zero padding to 64 bytes
+    vector block: float32 rows, one contiguous run per class, 64-byte aligned
+    metadata:     zlib-compressed JSON (format, model, dims, per-class columns)
+    uint64        metadata length
+    "CBSNAP01"
+
+Properties are stored column-wise (one list per property) next to the ids; the
+vector block can be memory-mapped and sliced per row without loading the file.
+Vectors are streamed to disk while paging through Weaviate, so only the
+metadata columns are held in memory during export.
+"""
+
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from app.config import config
+from app.embedding_migration import stored_dimensions
+from app.logger import get_logger
+from app.vectorizer import configured_dimensions
+from app.weaviate_client import VECTOR_CLASSES, batch_write, ensure_webcontent_schema, get_client
+
+logger = get_logger("snapshot")
+
+MAGIC = b"CBSNAP01"
+FORMAT_VERSION = 1
+ALIGN = 64
+PAGE_SIZE = 500
+# Classes with vectors (VECTOR_CLASSES) go to the vector block; BusinessProfile is metadata only
+SNAPSHOT_CLASSES = ("WebContent", "CustomQA", "BusinessProfile")
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _website_filter(website: str) -> dict:
+    return {"path": ["website"], "operator": "Equal", "valueText": website}
+
+
+def _pad(f, align: int = ALIGN):
+    f.write(b"\0" * (-f.tell() % align))
+
+
+def _iter_site_objects(client, class_name: str, website: str, with_vector: bool) -> Iterator[dict]:
+    """
+    Yield one class's objects for `website`. The class is scanned with the
+    cursor API (ids and website only), which is stable while objects are
+    written and not capped at QUERY_MAXIMUM_RESULTS like offset paging, but
+    can't filter; each page's matches are then fetched by id.
+    """
+    properties = [p["name"] for p in client.schema.get(class_name).get("properties", [])]
+    additional = ["id", "vector"] if with_vector else ["id"]
+    after = None
+    while True:
+        query = client.query.get(class_name, ["website"]).with_additional(["id"]).with_limit(PAGE_SIZE)
+        if after:
+            query = query.with_after(after)
+        rows = _rows(query.do(), class_name)
+        ids = [row["_additional"]["id"] for row in rows if row.get("website") == website]
+        if ids:
+            yield from _rows(
+                client.query.get(class_name, properties)
+                .with_where({"path": ["id"], "operator": "ContainsAny", "valueTextArray": ids})
+                .with_additional(additional)
+                .with_limit(len(ids))
+                .do(),
+                class_name,
+            )
+        if len(rows) < PAGE_SIZE:
+            return
+        after = rows[-1]["_additional"]["id"]
+
+
+def _rows(res: dict, class_name: str) -> List[dict]:
+    if res.get("errors"):
+        raise SnapshotError(f"{class_name} query failed: {res['errors']}")
+    return res.get("data", {}).get("Get", {}).get(class_name) or []
+
+
+def _vector_bytes(vector: List[float]) -> bytes:
+    block = array("f", vector)
+    if sys.byteorder == "big":
+        block.byteswap()
+    return block.tobytes()
+
+
+def export_site(website: str, path: Path) -> dict:
+    """Write a snapshot of `website` to `path`; returns per-class counts."""
+    client = get_client()
+    meta = {
+        "format": FORMAT_VERSION,
+        "website": website,
+        "embeddingModel": config.LLM_EMBEDDING_MODEL,
+        "dimensions": None,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "classes": {},
+    }
+    tmp = path.with_suffix(path.suffix + ".partial")
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        _pad(f)
+        for class_name in SNAPSHOT_CLASSES:
+            with_vector = class_name in VECTOR_CLASSES
+            ids: List[str] = []
+            columns: Dict[str, list] = {}
+            if with_vector:
+                _pad(f)
+            offset = f.tell()
+            for row in _iter_site_objects(client, class_name, website, with_vector):
+                extra = row.pop("_additional")
+                if with_vector:
+                    vector = extra["vector"]
+                    if meta["dimensions"] is None:
+                        meta["dimensions"] = len(vector)
+                    elif len(vector) != meta["dimensions"]:
+                        raise SnapshotError(
+                            f"{class_name} {extra['id']}: {len(vector)} dims, expected {meta['dimensions']}"
+                        )
+                    f.write(_vector_bytes(vector))
+                n = len(ids)
+                ids.append(extra["id"])
+                for key, value in row.items():
+                    columns.setdefault(key, [None] * n).append(value)
+                for col in columns.values():
+                    if len(col) < len(ids):
+                        col.append(None)
+            meta["classes"][class_name] = {
+                "count": len(ids),
+                "vectorOffset": offset if with_vector else None,
+                "ids": ids,
+                "columns": columns,
+            }
+            logger.info("Exported %d %s objects for %s", len(ids), class_name, website)
+
+        blob = zlib.compress(json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+        f.write(blob)
+        f.write(struct.pack("<Q", len(blob)))
+        f.write(MAGIC)
+    tmp.replace(path)
+    return {name: c["count"] for name, c in meta["classes"].items()}
+
+
+class Snapshot:
+    """Read-only view of a snapshot file; vectors are sliced from an mmap."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise SnapshotError(f"{path} is not a snapshot")
+        if self._mm[:8] != MAGIC or self._mm[-8:] != MAGIC:
+            self.close()
+            raise SnapshotError(f"{path} is not a snapshot")
+        (meta_len,) = struct.unpack("<Q", self._mm[-16:-8])
+        self.meta = json.loads(zlib.decompress(self._mm[-16 - meta_len:-16]))
+        if self.meta.get("format") != FORMAT_VERSION:
+            self.close()
+            raise SnapshotError(f"Unsupported snapshot format {self.meta.get('format')}")
+        self.dimensions: Optional[int] = self.meta["dimensions"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def vectors(self, class_name: str) -> Optional[memoryview]:
+        """float32 rows of `class_name` as one flat zero-copy view (None for no vectors)."""
+        info = self.meta["classes"][class_name]
+        if info["vectorOffset"] is None or not info["count"]:
+            return None
+        start = info["vectorOffset"]
+        end = start + info["count"] * self.dimensions * 4
+        view = memoryview(self._mm)[start:end]
+        if sys.byteorder == "big":  # rare; copy and swap once
+            block = array("f", view.tobytes())
+            block.byteswap()
+            view = memoryview(block.tobytes())
+        return view.cast("f")
+
+    def objects(self, class_name: str) -> Iterator[tuple]:
+        """Yield (uuid, properties, vector or None) rows."""
+        info = self.meta["classes"][class_name]
+        columns = info["columns"]
+        vectors = self.vectors(class_name)
+        dims = self.dimensions
+        try:
+            for i, uuid in enumerate(info["ids"]):
+                props = {key: col[i] for key, col in columns.items()}
+                vector = vectors[i * dims:(i + 1) * dims].tolist() if vectors is not None else None
+                yield uuid, props, vector
+        finally:
+            if vectors is not None:
+                vectors.release()  # the mmap can't be closed while views exist
+
+
+def import_site(path: Path, replace: bool = False, batch_size: int = 200) -> dict:
+    """
+    Restore a snapshot with batched writes, keeping object ids (re-importing is
+    idempotent). `replace` first deletes the website's existing objects.
+    """
+    with Snapshot(path) as snap:
+        website = snap.meta["website"]
+        if snap.meta["embeddingModel"] != config.LLM_EMBEDDING_MODEL:
+            raise SnapshotError(
+                f"Snapshot vectors are from {snap.meta['embeddingModel']}, "
+                f"configured model is {config.LLM_EMBEDDING_MODEL}"
+            )
+        # Query vectors are embedded at the configured size, so stored vectors must match it
+        target = configured_dimensions()
+        if snap.dimensions and target and snap.dimensions != target:
+            raise SnapshotError(
+                f"Snapshot has {snap.dimensions}-dim vectors, configured embedding size is {target}; "
+                "set llm.embedding_dimensions to match or re-index the site"
+            )
+        if not ensure_webcontent_schema():
+            raise SnapshotError("Could not create the Weaviate schema, see the errors above")
+        client = get_client()
+        for class_name in VECTOR_CLASSES:
+            stored = stored_dimensions(client, class_name)
+            if snap.dimensions and stored and stored != snap.dimensions:
+                raise SnapshotError(
+                    f"{class_name} stores {stored}-dim vectors, snapshot has {snap.dimensions}; "
+                    "run migrate-embeddings first or re-index the site"
+                )
+
+        report = {"website": website, "classes": {}}
+        for class_name in SNAPSHOT_CLASSES:
+            if class_name not in snap.meta["classes"]:
+                continue
+            if replace:
+                client.batch.delete_objects(class_name, where=_website_filter(website))
+            objects = snap.objects(class_name)
+            try:
+                errors = batch_write(client, class_name, objects, batch_size=batch_size)
+            finally:
+                objects.close()  # release its view of the file, or closing the snapshot fails
+            for err in errors[:3]:
+                logger.warning("%s: import error: %s", class_name, err)
+            count = snap.meta["classes"][class_name]["count"]
+            report["classes"][class_name] = {"objects": count, "failed": len(errors)}
+            logger.info("Imported %d/%d %s objects for %s", count - len(errors), count, class_name, website)
+        return report
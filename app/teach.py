@@ -0,0 +1,234 @@
+"""
+Taught Q&A pairs (CustomQA): single and bulk upserts, bulk deletes.
+
+Every pair gets a deterministic id derived from (website, normalized question),
+the same way BusinessProfile ids come from the website, so teaching the same
+question again replaces its answer instead of adding a duplicate, and a pair
+can be deleted by re-sending its question.
+
+Bulk input is JSONL (one {"question", "answer"[, "website"]} object per line)
+or CSV with a header row using the same column names. Questions are embedded in
+batches and written with the batch API; every row that could not be parsed,
+embedded or stored is reported with its line number.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import NAMESPACE_URL, uuid5
+
+from app.logger import get_logger
+from app.metrics import TEACH_ROWS, span
+from app.singleflight import normalize_question
+from app.vectorizer import embed, embed_batch
+from app.weaviate_client import batch_write, get_client
+
+logger = get_logger("teach")
+
+CLASS_NAME = "CustomQA"
+FORMATS = ("jsonl", "csv")
+BATCH_SIZE = 100          # questions per embeddings request / objects per batch write
+DELETE_BATCH_SIZE = 1000  # ids per batch delete (well below Weaviate's query maximum)
+MAX_BULK_BYTES = 10 * 1024 * 1024
+
+
+class TeachError(ValueError):
+    pass
+
+
+def qa_id(website: str, question: str) -> str:
+    """Stable CustomQA id: one object per website and normalized question."""
+    return str(uuid5(NAMESPACE_URL, f"{website}#qa:{normalize_question(question)}"))
+
+
+def detect_format(name: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """csv for *.csv files or text/csv bodies, jsonl otherwise."""
+    if (name and name.lower().endswith(".csv")) or (content_type and "csv" in content_type.lower()):
+        return "csv"
+    return "jsonl"
+
+
+def parse_rows(text: str, fmt: str) -> Tuple[List[dict], List[dict]]:
+    """
+    Parse bulk input into rows ({"row": line number, "question", "answer", "website"})
+    and per-row errors. Blank lines are skipped.
+    """
+    if fmt not in FORMATS:
+        raise TeachError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    rows, errors = [], []
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                errors.append({"row": line_no, "error": f"invalid JSON: {e}"})
+                continue
+            if not isinstance(item, dict):
+                errors.append({"row": line_no, "error": "expected a JSON object"})
+                continue
+            rows.append(_row(line_no, item))
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "question" not in reader.fieldnames:
+            raise TeachError("CSV needs a header row with at least a 'question' column")
+        for item in reader:
+            if not any((v or "").strip() for v in item.values() if isinstance(v, str)):
+                continue
+            rows.append(_row(reader.line_num, item))
+    return rows, errors
+
+
+def _row(line_no: int, item: dict) -> dict:
+    def text(key):
+        value = item.get(key)
+        return value.strip() if isinstance(value, str) else value
+
+    return {"row": line_no, "question": text("question"), "answer": text("answer"), "website": text("website")}
+
+
+def _validate(rows: Iterable[dict], website: Optional[str], need_answer: bool) -> Tuple[List[dict], List[dict]]:
+    valid, errors = [], []
+    for row in rows:
+        row = dict(row, website=row.get("website") or website)
+        if not row["website"]:
+            errors.append(_failure(row, "missing website"))
+        elif not isinstance(row["question"], str) or not row["question"]:
+            errors.append(_failure(row, "missing question"))
+        elif need_answer and (not isinstance(row["answer"], str) or not row["answer"]):
+            errors.append(_failure(row, "missing answer"))
+        else:
+            row["id"] = qa_id(row["website"], row["question"])
+            valid.append(row)
+    return valid, errors
+
+
+def _failure(row: dict, error) -> dict:
+    if isinstance(error, dict):  # Weaviate: {"error": [{"message": ...}, ...]}
+        error = "; ".join(e.get("message", str(e)) for e in error.get("error") or []) or error
+    return {"row": row.get("row"), "question": row.get("question"), "error": str(error)}
+
+
+def _dedupe(rows: List[dict]) -> Tuple[List[dict], int]:
+    """Keep the last row per id, in input order of those last rows."""
+    last: Dict[str, dict] = {}
+    for row in rows:
+        last.pop(row["id"], None)
+        last[row["id"]] = row
+    return list(last.values()), len(rows) - len(last)
+
+
+def _properties(row: dict) -> dict:
+    return {
+        "website": row["website"],
+        "question": row["question"],
+        "answer": row["answer"],
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def teach(website: str, question: str, answer: str) -> str:
+    """Upsert one pair; returns its id."""
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        raise TeachError("question and answer must not be empty")
+    obj_id = qa_id(website, question)
+    vector = embed(question)
+    props = _properties({"website": website, "question": question, "answer": answer})
+    client = get_client()
+    if client.data_object.exists(obj_id, class_name=CLASS_NAME):
+        client.data_object.replace(props, CLASS_NAME, obj_id, vector=vector)
+    else:
+        client.data_object.create(props, CLASS_NAME, uuid=obj_id, vector=vector)
+    TEACH_ROWS.inc(result="upserted")
+    return obj_id
+
+
+def bulk_teach(rows: List[dict], website: Optional[str] = None, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Embed and upsert parsed rows; `website` is the default for rows without one.
+    A failed embeddings request or batch write only fails the rows in that batch.
+    """
+    valid, failed = _validate(rows, website, need_answer=True)
+    valid, duplicates = _dedupe(valid)
+    client = get_client()
+    upserted = 0
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        try:
+            with span("teach.batch"):
+                vectors = embed_batch([row["question"] for row in batch])
+                errors = batch_write(
+                    client, CLASS_NAME,
+                    ((row["id"], _properties(row), vec) for row, vec in zip(batch, vectors)),
+                    batch_size=batch_size,
+                )
+        except Exception as e:
+            logger.warning("Teach batch of %d rows failed: %s", len(batch), e)
+            failed.extend(_failure(row, e) for row in batch)
+            continue
+        by_id = {str(err["id"]): err["errors"] for err in errors}
+        for row in batch:
+            if row["id"] in by_id:
+                failed.append(_failure(row, by_id[row["id"]]))
+            else:
+                upserted += 1
+
+    TEACH_ROWS.inc(upserted, result="upserted")
+    TEACH_ROWS.inc(len(failed), result="failed")
+    failed.sort(key=lambda f: f["row"] or 0)
+    logger.info("Taught %d Q&A pairs (%d failed, %d duplicate rows)", upserted, len(failed), duplicates)
+    return {"rows": len(rows), "upserted": upserted, "duplicates": duplicates, "failed": failed}
+
+
+def bulk_delete(rows: List[dict], website: Optional[str] = None, batch_size: int = DELETE_BATCH_SIZE) -> dict:
+    """Delete the pairs whose questions are listed; unknown questions are reported as not found."""
+    valid, failed = _validate(rows, website, need_answer=False)
+    valid, duplicates = _dedupe(valid)
+    client = get_client()
+    deleted = 0
+    not_found = []
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        try:
+            with span("teach.delete"):
+                res = client.batch.delete_objects(
+                    CLASS_NAME,
+                    where={"path": ["id"], "operator": "ContainsAny", "valueTextArray": [r["id"] for r in batch]},
+                    output="verbose",
+                )
+        except Exception as e:
+            logger.warning("Teach delete batch of %d rows failed: %s", len(batch), e)
+            failed.extend(_failure(row, e) for row in batch)
+            continue
+        results = {o.get("id"): o for o in (res.get("results") or {}).get("objects") or []}
+        for row in batch:
+            result = results.get(row["id"])
+            if result is None:
+                not_found.append(row["row"])
+            elif result.get("status") == "SUCCESS":
+                deleted += 1
+            else:
+                failed.append(_failure(row, result.get("errors") or result.get("status")))
+
+    TEACH_ROWS.inc(deleted, result="deleted")
+    failed.sort(key=lambda f: f["row"] or 0)
+    logger.info("Deleted %d Q&A pairs (%d not found, %d failed)", deleted, len(not_found), len(failed))
+    return {
+        "rows": len(rows), "deleted": deleted, "duplicates": duplicates,
+        "notFound": not_found, "failed": failed,
+    }
+
+
+def delete_website(website: str) -> int:
+    """Delete every taught pair of `website`; returns the number removed."""
+    res = get_client().batch.delete_objects(
+        CLASS_NAME, where={"path": ["website"], "operator": "Equal", "valueText": website},
+    )
+    deleted = (res.get("results") or {}).get("successful", 0)
+    TEACH_ROWS.inc(deleted, result="deleted")
+    logger.info("Deleted all %d Q&A pairs of %s", deleted, website)
+    return deleted
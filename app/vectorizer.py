@@ -1,53 +1,99 @@
 import hashlib
 from app.config import config
-from app.weaviate_client import get_client
 from app.logger import get_logger
-from openai import OpenAI
+from app.metrics import EMBEDDING_CALLS, span
+from app.openai_client import get_openai
+from app.singleflight import SingleFlight
 
 logger = get_logger("vectorizer")
-client_oa = OpenAI(api_key=config.OPENAI_API_KEY)
+embed_flight = SingleFlight("embeddings")
 
+EMBED_BATCH_SIZE = 256  # inputs per embeddings request
+# Full vector size of known embedding models (used when no size is configured)
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
 
-def _hash_text(text: str) -> str:
+
+def hash_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
+def embed(text: str) -> list[float]:
+    """
+    Embed one text. Concurrent requests for the same text (e.g. two index runs
+    of one site, or a burst of identical questions) share a single API call.
+    """
+    return embed_flight.do(_embed_key(text), lambda: _create_embedding(text))
+
+
+def embed_shared(texts: list[str]) -> list[list[float]]:
+    """
+    `embed_batch` with the configured size, for indexing: texts that another
+    caller (a concurrent index run, another embed worker, `embed`) is already
+    embedding are waited for instead of sent again.
+    """
+    keys = [_embed_key(text) for text in texts]
+    by_key = dict(zip(keys, texts))
+    return embed_flight.do_batch(keys, lambda lead: embed_batch([by_key[k] for k in lead]))
+
+
+def _embed_key(text: str) -> tuple:
+    return config.LLM_EMBEDDING_MODEL, config.LLM_EMBEDDING_DIMENSIONS, hash_text(text)
+
+
+def configured_dimensions() -> int | None:
+    """Vector size new embeddings will have (None for an unknown model at full size)."""
+    return config.LLM_EMBEDDING_DIMENSIONS or MODEL_DIMENSIONS.get(config.LLM_EMBEDDING_MODEL)
+
+
+def _embedding_params(dimensions: int | None) -> dict:
+    params = {"model": config.LLM_EMBEDDING_MODEL}
+    if dimensions:
+        params["dimensions"] = dimensions
+    return params
+
+
+@span("embed")
+def _create_embedding(text: str) -> list[float]:
+    EMBEDDING_CALLS.inc(model=config.LLM_EMBEDDING_MODEL)
+    params = _embedding_params(config.LLM_EMBEDDING_DIMENSIONS)
+    return get_openai().embeddings.create(input=text, **params).data[0].embedding
+
+
+def embed_batch(texts: list[str], dimensions: int | None = None, batch_size: int = EMBED_BATCH_SIZE) -> list[list[float]]:
+    """
+    Embed many texts with one request per `batch_size` inputs, in input order.
+    `dimensions` overrides the configured size (e.g. 0 for the model's full size).
+    """
+    if dimensions is None:
+        dimensions = config.LLM_EMBEDDING_DIMENSIONS
+    params = _embedding_params(dimensions)
+    vectors: list[list[float]] = []
+    for start in range(0, len(texts), batch_size):
+        with span("embed.batch"):
+            EMBEDDING_CALLS.inc(model=config.LLM_EMBEDDING_MODEL)
+            resp = get_openai().embeddings.create(input=texts[start:start + batch_size], **params)
+        vectors.extend(d.embedding for d in sorted(resp.data, key=lambda d: d.index))
+    return vectors
+
+
+def chunk_text(text: str, size: int = 1500) -> list[str]:
+    """Split text into fixed-size character chunks."""
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
 def upload_documents(docs: list[dict], website: str):
     """
-    Break docs into chunks and upload to Weaviate.
+    Break docs into chunks and upload to Weaviate (chunk → embed → write
+    pipeline; see app.pipeline).
     """
     if not docs:
         return
 
-    client = get_client()
-
-    for doc in docs:
-        text = doc["text"]
-        # Simple chunking
-        chunks = [text[i : i + 1500] for i in range(0, len(text), 1500)]
-
-        for idx, chunk in enumerate(chunks):
-            try:
-                emb = client_oa.embeddings.create(
-                    input=chunk,
-                    model=config.LLM_EMBEDDING_MODEL
-                ).data[0].embedding
-
-                client.data_object.create(
-                    {
-                        "text": chunk,
-                        "source": doc["url"],
-                        "website": website,
-                        "title": doc.get("title"),
-                        "section": f"chunk-{idx}",
-                        "contentType": "text/html",
-                        "fetchedAt": doc.get("fetchedAt"),
-                        "hash": _hash_text(chunk),
-                    },
-                    "WebContent",
-                    vector=emb,
-                )
-            except Exception as e:
-                logger.warning(f"Chunk upload failed: {e}")
-
-    logger.info(f"Uploaded {len(docs)} docs for {website}")
+    from app.pipeline import upload_pipeline  # the pipeline builds on this module
+
+    report = upload_pipeline(docs, website).run()
+    logger.info("Uploaded %d docs (%d chunks) for %s", len(docs), report["stages"]["chunk"]["items"], website)
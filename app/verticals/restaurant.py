@@ -86,7 +86,7 @@ def _scrape_simple_html_menu(url: str) -> str:
 
         return "\n".join(lines)
     except Exception as e:
-        logger.warning(f"Simple HTML scrape failed for {url}: {e}")
+        logger.warning("Simple HTML scrape failed for %s: %s", url, e)
         return ""
 
 
@@ -122,7 +122,7 @@ def extract_restaurant_profile(website: str, homepage_html: str) -> dict:
                 all_items.extend(items)
 
         except Exception as e:
-            logger.warning(f"Menu parse failed for {u}: {e}")
+            logger.warning("Menu parse failed for %s: %s", u, e)
 
     # If still nothing, try to pull simple items from homepage itself (rarely enough)
     if not all_items:
@@ -1,3 +1,9 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import requests
 import weaviate
 from app.config import config
 from app.logger import get_logger
@@ -5,42 +11,267 @@ from app.logger import get_logger
 logger = get_logger("weaviate")
 
 _client = None
+_client_lock = threading.Lock()
+_batch_lock = threading.Lock()  # client.batch is shared state on the one client
 
+# Errors that mean "Weaviate is unreachable", as opposed to a bad query
+CONNECTION_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    weaviate.exceptions.WeaviateStartUpError,
+)
 
-def get_client() -> weaviate.Client:
-    """Lazy-init Weaviate client and return it."""
+
+class WeaviateUnavailable(RuntimeError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass. After `failure_threshold` consecutive connection
+    failures it opens and calls fail fast; after `reset_timeout` seconds one
+    trial call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Admit a guarded call; after `reset_timeout` the first one becomes the trial."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                return True
+            return False
+
+    def rejecting(self) -> bool:
+        """True while open and cooling down; never takes the half-open trial."""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Weaviate circuit closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("Weaviate circuit opened after %d failures", self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(config.WEAVIATE_FAILURE_THRESHOLD, config.WEAVIATE_RESET_TIMEOUT)
+
+
+class HealthMonitor:
+    """Background thread probing Weaviate readiness off the request path."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.ready = False
+        self.last_check: str | None = None
+        self.last_error: str | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="weaviate-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self) -> bool:
+        try:
+            ready = bool(_connect().is_ready())
+            self.last_error = None if ready else "is_ready() returned False"
+        except Exception as e:
+            ready = False
+            self.last_error = repr(e)
+        self.ready = ready
+        self.last_check = datetime.now(timezone.utc).isoformat()
+        if ready:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return ready
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "circuit": breaker.state,
+            "consecutiveFailures": breaker.failures,
+            "lastCheck": self.last_check,
+            "lastError": self.last_error,
+        }
+
+
+health = HealthMonitor(config.WEAVIATE_HEALTH_INTERVAL)
+
+
+def _connect() -> weaviate.Client:
+    """Create the process-wide client once (its HTTP session is pooled)."""
     global _client
     if _client is None:
-        _client = weaviate.Client(config.WEAVIATE_URL)
-    try:
-        if not _client.is_ready():
-            logger.warning("Weaviate client not ready (is_ready() returned False).")
-    except Exception as e:
-        logger.warning(f"Weaviate readiness check failed: {e}")
+        with _client_lock:
+            if _client is None:
+                # No startup wait: readiness is tracked by the health monitor
+                _client = weaviate.Client(config.WEAVIATE_URL, startup_period=None)
     return _client
 
-def ensure_webcontent_schema():
+
+def get_client() -> weaviate.Client:
+    """
+    Return the shared Weaviate client without a readiness round-trip.
+    Raises WeaviateUnavailable immediately while the circuit is open. It does
+    not take the half-open trial or report outcomes; request paths use
+    `guarded()` once and pass its client on.
+    """
+    if breaker.rejecting():
+        raise WeaviateUnavailable("Weaviate is unavailable (circuit open)")
+    try:
+        return _connect()
+    except CONNECTION_ERRORS as e:
+        breaker.record_failure()
+        raise WeaviateUnavailable(f"Cannot connect to Weaviate: {e}") from e
+
+
+@contextmanager
+def guarded():
+    """
+    Yield the client and feed connection failures/successes to the breaker:
+        with guarded() as client:
+            client.query...
+    Only guarded calls move an open circuit to half-open, so each one reports
+    its outcome (any answer from Weaviate, even an error, counts as reachable).
+    """
+    if not breaker.allow():
+        raise WeaviateUnavailable("Weaviate is unavailable (circuit open)")
+    try:
+        client = _connect()
+    except CONNECTION_ERRORS as e:
+        breaker.record_failure()
+        raise WeaviateUnavailable(f"Cannot connect to Weaviate: {e}") from e
+    try:
+        yield client
+    except CONNECTION_ERRORS:
+        breaker.record_failure()
+        raise
+    except Exception:
+        breaker.record_success()
+        raise
+    else:
+        breaker.record_success()
+
+
+def batch_write(client, class_name: str, objects, batch_size: int = 100) -> list:
+    """
+    Write (uuid, properties, vector) tuples with the batch API; existing ids are
+    replaced. Returns the per-object errors reported by Weaviate.
+    """
+    errors = []
+
+    def on_results(results):
+        for r in results or []:
+            err = (r.get("result") or {}).get("errors")
+            if err:
+                errors.append({"id": r.get("id"), "errors": err})
+
+    with _batch_lock:
+        client.batch.configure(batch_size=batch_size, dynamic=False, callback=on_results)
+        with client.batch as batch:
+            for uuid, props, vector in objects:
+                props = {k: v for k, v in props.items() if v is not None}
+                batch.add_data_object(props, class_name, uuid=uuid, vector=vector)
+    return errors
+
+
+VECTOR_CLASSES = ("WebContent", "CustomQA")
+
+
+def vector_index_config() -> dict:
+    """`vectorIndexConfig` for the embedded classes (cosine + configured compression)."""
+    index_config = {"distance": "cosine"}
+    if config.VECTOR_COMPRESSION == "pq":
+        pq = {"enabled": True, "trainingLimit": config.PQ_TRAINING_LIMIT}
+        if config.PQ_SEGMENTS:
+            pq["segments"] = config.PQ_SEGMENTS
+        index_config["pq"] = pq
+    elif config.VECTOR_COMPRESSION == "bq":
+        index_config["bq"] = {"enabled": True}
+    return index_config
+
+
+def _sync_compression(client, cls: dict):
+    """Enable PQ on an existing class; BQ can only be set when a class is created."""
+    name = cls.get("class")
+    current = cls.get("vectorIndexConfig") or {}
+    pq_on = bool((current.get("pq") or {}).get("enabled"))
+    bq_on = bool((current.get("bq") or {}).get("enabled"))
+    wanted = config.VECTOR_COMPRESSION
+
+    if wanted == "pq" and not pq_on and not bq_on:
+        try:
+            client.schema.update_config(name, {"vectorIndexConfig": {"pq": vector_index_config()["pq"]}})
+            logger.info("Enabled PQ compression on %s", name)
+        except Exception as e:
+            logger.error("Enabling PQ on %s failed: %s", name, e)
+    elif (wanted == "bq") != bq_on or (wanted == "none" and pq_on):
+        logger.warning(
+            "%s compression differs from config (%s); "
+            "run `python -m app.cli migrate-embeddings` to rebuild the class", name, wanted,
+        )
+
+
+def ensure_webcontent_schema() -> bool:
     """
     Ensure all required classes exist in Weaviate:
     - WebContent: embedded text chunks
     - BusinessProfile: structured per-website facts
     - CustomQA: manually fed Q&A pairs
+    Errors are logged; returns False if the schema could not be read or a
+    class could not be created.
     """
-    client = get_client()
     try:
+        client = get_client()
         schema = client.schema.get()
     except Exception as e:
-        logger.error(f"Failed to get Weaviate schema: {e}")
-        return
+        logger.error("Failed to get Weaviate schema: %s", e)
+        return False
 
-    existing = {cls.get("class") for cls in schema.get("classes", [])}
+    classes = {cls.get("class"): cls for cls in schema.get("classes", [])}
+    existing = set(classes)
+    ok = True
 
     # --- WebContent: embedded text chunks ---
     if "WebContent" not in existing:
         try:
             client.schema.create_class({
                 "class": "WebContent",
-                "vectorIndexConfig": {"distance": "cosine"},
+                "vectorIndexConfig": vector_index_config(),
                 "properties": [
                     {"name": "text", "dataType": ["text"]},
                     {"name": "source", "dataType": ["string"]},
@@ -54,9 +285,11 @@ def ensure_webcontent_schema():
             })
             logger.info("Created schema for WebContent")
         except Exception as e:
-            logger.error(f"Creating WebContent class failed: {e}")
+            logger.error("Creating WebContent class failed: %s", e)
+            ok = False
     else:
         logger.info("WebContent class exists")
+        _sync_compression(client, classes["WebContent"])
 
     # --- BusinessProfile: structured per-website facts ---
     if "BusinessProfile" not in existing:
@@ -82,7 +315,8 @@ def ensure_webcontent_schema():
             })
             logger.info("Created schema for BusinessProfile")
         except Exception as e:
-            logger.error(f"Creating BusinessProfile class failed: {e}")
+            logger.error("Creating BusinessProfile class failed: %s", e)
+            ok = False
     else:
         logger.info("BusinessProfile class exists")
 
@@ -91,7 +325,7 @@ def ensure_webcontent_schema():
         try:
             client.schema.create_class({
                 "class": "CustomQA",
-                "vectorIndexConfig": {"distance": "cosine"},
+                "vectorIndexConfig": vector_index_config(),
                 "properties": [
                     {"name": "website", "dataType": ["string"]},
                     {"name": "question", "dataType": ["text"]},
@@ -101,6 +335,9 @@ def ensure_webcontent_schema():
             })
             logger.info("Created schema for CustomQA")
         except Exception as e:
-            logger.error(f"Creating CustomQA class failed: {e}")
+            logger.error("Creating CustomQA class failed: %s", e)
+            ok = False
     else:
         logger.info("CustomQA class exists")
+        _sync_compression(client, classes["CustomQA"])
+    return ok
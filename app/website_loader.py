@@ -1,15 +1,18 @@
 import re
+import threading
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, urldefrag
 from collections import deque
 from datetime import datetime, timezone
-import trafilatura
 
 from app.logger import get_logger
+from app.menu_index import build_menu_index
+from app.metrics import PAGES, span
 from app.profile_store import upsert_business_profile
 from app.verticals.detect import detect_vertical
 from app.verticals.restaurant import extract_restaurant_profile
+from app.parsing.boilerplate import BoilerplateFilter
 from app.parsing.contact_hours import (
     extract_jsonld_profiles,
     profile_from_jsonld,
@@ -35,15 +38,16 @@ POBOX_RE = re.compile(
 )
 
 
+@span("index.fetch")
 def _fetch_html(url: str) -> str | None:
     """Fetch raw HTML from a URL with headers and timeout."""
     try:
         resp = requests.get(url, timeout=15, headers=HEADERS)
         if resp.status_code == 200:
             return resp.text
-        logger.warning(f"{url} returned status {resp.status_code}")
+        logger.warning("%s returned status %s", url, resp.status_code)
     except Exception as e:
-        logger.warning(f"Failed to fetch {url}: {e}")
+        logger.warning("Failed to fetch %s: %s", url, e)
     return None
 
 
@@ -52,11 +56,14 @@ def is_internal_link(base_url: str, link: str) -> bool:
     return urlparse(link).netloc == urlparse(base_url).netloc
 
 
+@span("index.extract")
 def extract_main_text(html: str, url: str) -> str:
     """
     Prefer trafilatura's readability extraction; fall back to headings + paragraphs.
     """
     try:
+        import trafilatura  # heavy; only needed when indexing
+
         out = trafilatura.extract(
             html,
             url=url,
@@ -85,55 +92,146 @@ def extract_main_text(html: str, url: str) -> str:
     return "\n".join(parts)
 
 
-def crawl_website(base_url: str, limit: int = 10) -> list[dict]:
+def iter_pages(base_url: str, limit: int | None = None):
     """
-    BFS crawl within the same host. Returns a list of docs:
-      { "url", "text", "title", "fetchedAt" }
+    BFS fetch within the same host. Yields raw pages as they are fetched:
+      { "url", "html", "title", "fetchedAt" }
+    Links are queued from each page before it is yielded; stop iterating (or
+    pass `limit`) to end the crawl.
     """
     visited = set()
     queue = deque([base_url])
-    results = []
+    fetched = 0
 
-    while queue and len(results) < limit:
+    while queue and (limit is None or fetched < limit):
         url = queue.popleft()
         if url in visited:
             continue
 
         html = _fetch_html(url)
         if not html:
+            PAGES.inc(result="fetch_failed")
             continue
 
         try:
             visited.add(url)
-            soup = BeautifulSoup(html, "html.parser")
-            full_text = extract_main_text(html, url)
-            if not full_text.strip():
-                logger.info(f"No useful content on {url}")
-                continue
-
-            results.append({
-                "url": url,
-                "text": full_text,
-                "title": (soup.title.string.strip() if soup.title and soup.title.string else None),
-                "fetchedAt": datetime.now(timezone.utc).isoformat(),
-            })
+            with span("index.parse_html"):
+                soup = BeautifulSoup(html, "html.parser")
 
             # enqueue internal links
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                if href.startswith("#"):
-                    continue
-                link = urljoin(url, href)
-                link = urldefrag(link)[0].rstrip("/")  # normalize
-                if is_internal_link(base_url, link) and link not in visited:
-                    queue.append(link)
+            with span("index.links"):
+                for a in soup.find_all("a", href=True):
+                    href = a["href"]
+                    if href.startswith("#"):
+                        continue
+                    link = urljoin(url, href)
+                    link = urldefrag(link)[0].rstrip("/")  # normalize
+                    if is_internal_link(base_url, link) and link not in visited:
+                        queue.append(link)
+            title = soup.title.string.strip() if soup.title and soup.title.string else None
         except Exception as e:
-            logger.warning(f"Failed to crawl {url}: {e}")
+            PAGES.inc(result="failed")
+            logger.warning("Failed to crawl %s: %s", url, e)
+            continue
+
+        fetched += 1
+        yield {
+            "url": url,
+            "html": html,
+            "title": title,
+            "fetchedAt": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+def page_to_doc(page: dict) -> dict | None:
+    """Extract the main text of a fetched page; None if nothing useful is left."""
+    try:
+        full_text = extract_main_text(page["html"], page["url"])
+    except Exception as e:
+        PAGES.inc(result="failed")
+        logger.warning("Failed to extract %s: %s", page["url"], e)
+        return None
+    if not full_text.strip():
+        logger.info("No useful content on %s", page["url"])
+        PAGES.inc(result="empty")
+        return None
+    PAGES.inc(result="ok")
+    return {"url": page["url"], "text": full_text, "title": page["title"], "fetchedAt": page["fetchedAt"]}
+
+
+def iter_crawl(base_url: str, limit: int = 10, strip_boilerplate: bool = True):
+    """
+    Yield up to `limit` docs with content: { "url", "text", "title", "fetchedAt" }.
+    Blocks repeated across pages (footer, cookie notice, ...) are kept only on
+    the first page they appear on.
+    """
+    boilerplate = BoilerplateFilter() if strip_boilerplate else None
+    produced = 0
+    for page in iter_pages(base_url):
+        doc = page_to_doc(page)
+        if doc and boilerplate:
+            doc["text"] = boilerplate.strip(doc["text"])
+        if doc and doc["text"]:
+            produced += 1
+            yield doc
+            if produced >= limit:
+                return
+
+
+def crawl_website(base_url: str, limit: int = 10, strip_boilerplate: bool = True) -> list[dict]:
+    """
+    BFS crawl within the same host. Returns a list of docs:
+      { "url", "text", "title", "fetchedAt" }
+    """
+    return list(iter_crawl(base_url, limit, strip_boilerplate))
 
-    return results
 
+class AddressFallback:
+    """
+    Keeps only the address snippets needed for the profile fallback while docs
+    stream past: first street address on a contact/about page, else on any
+    page, else the first PO Box.
+    """
 
-def detect_and_store_site_profile(website: str, docs: list[dict]) -> None:
+    PRIORITY_PATHS = ("/contact", "/kontakt", "/about", "/impressum", "/contact-us")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.priority_street = None
+        self.street = None
+        self.pobox = None
+
+    @classmethod
+    def from_docs(cls, docs: list[dict]) -> "AddressFallback":
+        fallback = cls()
+        for d in docs:
+            fallback.add(d.get("url") or "", d.get("text", "") or "")
+        return fallback
+
+    def add(self, url: str, text: str):
+        priority = any(x in url.lower() for x in self.PRIORITY_PATHS)
+        with self._lock:
+            if self.priority_street and self.pobox:
+                return
+            if not self.priority_street and (priority or not self.street):
+                m = ADDRESS_RE.search(text)
+                if m:
+                    snippet = " ".join(m.group(0).split())  # normalize spaces
+                    if priority:
+                        self.priority_street = snippet
+                    else:
+                        self.street = snippet
+            if not self.pobox:
+                m = POBOX_RE.search(text)
+                if m:
+                    self.pobox = " ".join(m.group(0).split())
+
+    def best(self) -> str | None:
+        return self.priority_street or self.street or self.pobox
+
+
+@span("index.profile")
+def detect_and_store_site_profile(website: str, addresses: "AddressFallback | list[dict]") -> None:
     """
     Build a structured BusinessProfile for the site and upsert it.
 
@@ -143,8 +241,11 @@ def detect_and_store_site_profile(website: str, docs: list[dict]) -> None:
       - Extract JSON-LD profile (name, phone, email, address, etc.).
       - Fallback to regex for contact info if missing.
       - Restaurant enrichment (menu parsing).
-      - Address fallback from crawled docs (street → PO Box).
+      - Address fallback from crawled docs (street → PO Box); pass the
+        `AddressFallback` collected while crawling, or the docs themselves.
     """
+    if not isinstance(addresses, AddressFallback):
+        addresses = AddressFallback.from_docs(addresses)
     try:
         homepage_html = _fetch_html(website)
         if not homepage_html:
@@ -179,24 +280,9 @@ def detect_and_store_site_profile(website: str, docs: list[dict]) -> None:
             "cuisines": [],
         }
 
-        # Address fallback: prioritize contact/about pages first
+        # Address fallback: contact/about pages first, then any page, then PO Box
         if not profile.get("address"):
-            prio_pages = [d for d in docs if any(x in (d.get("url") or "").lower()
-                                                 for x in ("/contact", "/kontakt", "/about", "/impressum", "/contact-us"))]
-            other_pages = [d for d in docs if d not in prio_pages]
-            for d in prio_pages + other_pages:
-                m = ADDRESS_RE.search(d.get("text", "") or "")
-                if m:
-                    profile["address"] = " ".join(m.group(0).split())  # normalize spaces
-                    break
-
-        # If still no address, try PO Box style
-        if not profile.get("address"):
-            for d in docs:
-                m = POBOX_RE.search(d.get("text", "") or "")
-                if m:
-                    profile["address"] = " ".join(m.group(0).split())
-                    break
+            profile["address"] = addresses.best()
 
         # Restaurant-specific enrichment
         if vertical == "restaurant":
@@ -205,6 +291,7 @@ def detect_and_store_site_profile(website: str, docs: list[dict]) -> None:
             profile["menuItems"] = rest.get("menuItems") or []
 
         upsert_business_profile(profile)
+        build_menu_index(website, profile["menuItems"])
         logger.info("BusinessProfile upserted.")
     except Exception as e:
-        logger.warning(f"Profile detection failed: {e}")
+        logger.warning("Profile detection failed: %s", e)
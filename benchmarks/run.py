@@ -0,0 +1,239 @@
+"""
+Offline benchmarks for the ingestion hot paths.
+
+Serves the checked-in corpus (benchmarks/corpus/site) from a local HTTP server and
+measures per-function throughput and peak memory, plus pages/second for a full
+offline index run (crawl, extract, boilerplate, chunk, profile + menu parsing; no OpenAI or
+Weaviate calls). Results are compared against a stored baseline.
+
+    python -m benchmarks.run                      # run and compare to baseline
+    python -m benchmarks.run --update-baseline    # record a new baseline
+    python -m benchmarks.run --only parse_pdf --repeat 20
+"""
+
+import argparse
+import functools
+import gc
+import http.server
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pytesseract import TesseractNotFoundError
+
+# Config requires a key at import; benchmarks never call the API.
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from app.parsing.boilerplate import BoilerplateFilter  # noqa: E402
+from app.parsing.contact_hours import extract_jsonld_profiles  # noqa: E402
+from app.parsing.menu_struct import structure_menu  # noqa: E402
+from app.parsing.pdf_image import parse_image, parse_pdf  # noqa: E402
+from app.vectorizer import chunk_text  # noqa: E402
+from app.verticals.detect import detect_vertical  # noqa: E402
+from app.verticals.restaurant import extract_restaurant_profile  # noqa: E402
+from app.website_loader import crawl_website, extract_main_text  # noqa: E402
+
+BENCH_DIR = Path(__file__).parent
+CORPUS_DIR = BENCH_DIR / "corpus" / "site"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server() -> tuple[http.server.ThreadingHTTPServer, str]:
+    handler = functools.partial(_QuietHandler, directory=str(CORPUS_DIR))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def load_corpus() -> dict:
+    html_pages = {
+        str(p.relative_to(CORPUS_DIR)): p.read_text(encoding="utf-8")
+        for p in sorted(CORPUS_DIR.rglob("*.html"))
+    }
+    menu_pdf = (CORPUS_DIR / "menus" / "speisekarte.pdf").read_bytes()
+    menu_image = (CORPUS_DIR / "menus" / "mittagskarte.png").read_bytes()
+    return {
+        "html": html_pages,
+        "pdf": menu_pdf,
+        "image": menu_image,
+        "menu_text": parse_pdf(menu_pdf),
+    }
+
+
+def build_benchmarks(corpus: dict, base_url: str) -> dict:
+    """name -> (callable, work units per call, unit label)."""
+    pages = list(corpus["html"].items())
+    html_bytes = sum(len(h.encode("utf-8")) for _, h in pages)
+    texts = [extract_main_text(html, f"{base_url}/{path}") for path, html in pages]
+    long_text = "\n".join(texts) * 20
+    text_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    menu_lines = corpus["menu_text"].count("\n") + 1
+    crawled = len(crawl_website(base_url, limit=50))
+
+    def full_index_run():
+        docs = crawl_website(base_url, limit=50)
+        for doc in docs:
+            chunk_text(doc["text"])
+        homepage = corpus["html"]["index.html"]
+        detect_vertical(homepage)
+        extract_jsonld_profiles(homepage)
+        extract_restaurant_profile(base_url, homepage)
+
+    return {
+        "extract_main_text": (
+            lambda: [extract_main_text(html, f"{base_url}/{path}") for path, html in pages],
+            html_bytes / 1024, "KiB/s",
+        ),
+        "crawl_website": (lambda: crawl_website(base_url, limit=50), crawled, "pages/s"),
+        "structure_menu": (lambda: structure_menu(corpus["menu_text"]), menu_lines, "lines/s"),
+        "extract_jsonld_profiles": (
+            lambda: [extract_jsonld_profiles(html) for _, html in pages], len(pages), "pages/s",
+        ),
+        "parse_pdf": (lambda: parse_pdf(corpus["pdf"]), 1, "docs/s"),
+        "parse_image": (lambda: parse_image(corpus["image"]), 1, "images/s"),
+        "chunk_text": (lambda: chunk_text(long_text), len(long_text) / 1024, "KiB/s"),
+        "strip_boilerplate": (
+            lambda: [f.strip(t) for f in [BoilerplateFilter()] for t in texts], text_bytes / 1024, "KiB/s",
+        ),
+        "full_index_run": (full_index_run, crawled, "pages/s"),
+    }
+
+
+def measure(fn, units: float, repeat: int, min_time: float = 0.05) -> dict:
+    fn()  # warm-up (imports, caches, connection setup)
+    start = time.perf_counter()
+    fn()
+    # Loop fast functions so each timed sample lasts at least `min_time`
+    loops = max(1, math.ceil(min_time / max(time.perf_counter() - start, 1e-9)))
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    median = statistics.median(samples)
+
+    peaks = []
+    for _ in range(3):
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(median * 1000, 3),
+        "throughput": round(units / median, 3) if median else float("inf"),
+        "peak_kib": round(min(peaks) / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, memory_threshold: float,
+            selected: list[str]) -> list[str]:
+    """
+    Return regression messages for selected benchmarks worse than baseline beyond the
+    thresholds. A baselined benchmark that produced no result counts as a regression.
+    """
+    regressions = []
+    for name in selected:
+        base = baseline.get("benchmarks", {}).get(name)
+        res = results.get(name)
+        if not base:
+            continue
+        if res is None:
+            regressions.append(f"{name}: in baseline but produced no result")
+            continue
+        if "throughput" not in res:  # skipped: external tool not installed
+            continue
+        if res["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {res['throughput']} {res['unit']} < baseline {base['throughput']}"
+            )
+        if res["peak_kib"] > base["peak_kib"] * (1 + memory_threshold):
+            regressions.append(f"{name}: peak memory {res['peak_kib']} KiB > baseline {base['peak_kib']} KiB")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (median is reported)")
+    parser.add_argument("--only", action="append", help="run only the named benchmark(s)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed throughput drop (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.5, help="allowed peak memory growth")
+    parser.add_argument("--update-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--json", type=Path, help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_fixture_server()
+    try:
+        corpus = load_corpus()
+        benches = build_benchmarks(corpus, base_url)
+        selected = args.only or list(benches)
+        unknown = [name for name in selected if name not in benches]
+        if unknown:
+            parser.error(f"unknown benchmark(s) {', '.join(unknown)}; choose from {', '.join(benches)}")
+
+        results = {}
+        print(f"{'benchmark':<26}{'median ms':>12}{'throughput':>14}  {'unit':<10}{'peak KiB':>10}")
+        for name in selected:
+            fn, units, unit = benches[name]
+            try:
+                res = measure(fn, units, args.repeat)
+            except TesseractNotFoundError as e:  # OCR binary not installed on this machine
+                print(f"{name:<26}{'skipped':>12}  ({type(e).__name__})")
+                results[name] = {"skipped": str(e), "unit": unit}
+                continue
+            res["unit"] = unit
+            results[name] = res
+            print(f"{name:<26}{res['median_ms']:>12}{res['throughput']:>14}  {unit:<10}{res['peak_kib']:>10}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        # Benchmarks not run (--only) or skipped keep their previous baseline
+        previous = json.loads(args.baseline.read_text()).get("benchmarks", {}) if args.baseline.exists() else {}
+        measured = {name: res for name, res in results.items() if "throughput" in res}
+        args.baseline.write_text(json.dumps({
+            "recorded": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "benchmarks": {**previous, **measured},
+        }, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("No baseline found; run with --update-baseline to record one.")
+        return 0
+
+    regressions = compare(
+        results, json.loads(args.baseline.read_text()), args.threshold, args.memory_threshold, selected
+    )
+    for msg in regressions:
+        print(f"REGRESSION {msg}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+import os
+
+# app.config refuses to load without a key; tests never call OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from app.admission import AdmissionController, Rejected
+
+
+def controller(max_concurrent=1, per_website=1, queue_size=1, per_website_queue=1, max_wait=1.0):
+    return AdmissionController(max_concurrent, per_website, queue_size, per_website_queue, max_wait)
+
+
+def test_admit_takes_and_returns_a_slot():
+    ac = controller()
+    with ac.admit("a"):
+        assert ac.snapshot()["running"] == 1
+        assert ac.snapshot()["busiestWebsites"] == {"a": 1}
+    assert ac.snapshot()["running"] == 0
+    assert ac.snapshot()["busiestWebsites"] == {}
+
+
+def test_waiter_is_admitted_when_a_slot_is_released():
+    ac = controller(max_wait=2.0)
+    ac.acquire("a")
+    admitted = threading.Event()
+
+    def wait():
+        ac.acquire("a")
+        admitted.set()
+
+    t = threading.Thread(target=wait)
+    t.start()
+    deadline = time.monotonic() + 2
+    while ac.waiting != 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    assert not admitted.is_set()
+    ac.release("a", 0.1)
+    t.join(2)
+    assert admitted.is_set()
+    assert ac.snapshot()["running"] == 1 and ac.waiting == 0
+
+
+def test_website_over_its_queue_gets_429():
+    ac = controller(max_concurrent=4, per_website=1, per_website_queue=0)
+    ac.acquire("a")
+    with pytest.raises(Rejected) as e:
+        ac.acquire("a")
+    assert (e.value.status_code, e.value.reason) == (429, "website_queue_full")
+    assert e.value.retry_after >= 1
+    ac.acquire("b")  # other websites are unaffected
+
+
+def test_full_global_queue_gets_503():
+    ac = controller(per_website=2, queue_size=0)
+    ac.acquire("a")
+    with pytest.raises(Rejected) as e:
+        ac.acquire("b")
+    assert (e.value.status_code, e.value.reason) == (503, "queue_full")
+
+
+def test_request_that_cannot_be_served_in_time_is_rejected_up_front():
+    ac = controller(max_wait=0.5)
+    ac.service_seconds = 10.0
+    ac.acquire("a")
+    start = time.monotonic()
+    with pytest.raises(Rejected) as e:
+        ac.acquire("a")
+    assert e.value.reason == "deadline"
+    assert e.value.retry_after == 10
+    assert time.monotonic() - start < 0.2
+    assert ac.waiting == 0
+
+
+def test_waiter_times_out():
+    ac = controller(max_wait=0.2)
+    ac.service_seconds = 0.01  # the estimate fits, but the slot is never released
+    ac.acquire("a")
+    with pytest.raises(Rejected) as e:
+        ac.acquire("a")
+    assert (e.value.status_code, e.value.reason) == (503, "timeout")
+    assert ac.waiting == 0 and ac.snapshot()["running"] == 1
+
+
+def test_release_updates_the_service_time_estimate():
+    ac = controller()
+    ac.service_seconds = 2.0
+    ac.acquire("a")
+    ac.release("a", 1.0)
+    assert ac.service_seconds == pytest.approx(1.8)
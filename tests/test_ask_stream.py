@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException, Response
+
+import app.main as main
+from app.admission import AdmissionController
+from app.singleflight import SingleFlight
+
+
+@pytest.fixture
+def ask(monkeypatch):
+    """Streaming /ask with retrieval and generation stubbed; generation waits for `release`."""
+    release = threading.Event()
+
+    def generate_stream(*args, **kwargs):
+        release.wait(2)
+        yield "an"
+        yield "swer"
+
+    admission = AdmissionController(max_concurrent=1, per_website=1, queue_size=0,
+                                    per_website_queue=0, max_wait=1.0)
+    monkeypatch.setattr(main, "admission", admission)
+    monkeypatch.setattr(main, "ask_flight", SingleFlight("ask"))
+    monkeypatch.setattr(main, "get_client", lambda: None)
+    monkeypatch.setattr(main, "get_openai", lambda: None)
+    monkeypatch.setattr(main, "fast_answer", lambda question, website: None)
+    monkeypatch.setattr(main, "standalone_question", lambda session, question: question)
+    monkeypatch.setattr(main, "_build_prompt", lambda question, website: ([], 0.9, 10))
+    monkeypatch.setattr(main, "generate_stream", generate_stream)
+
+    def call(question="Is the terrace heated?"):
+        req = main.AskRequest(q=question, website="https://ask.test", stream=True)
+        return main.ask_endpoint(req, Response())
+
+    call.admission = admission
+    call.release = release
+    yield call
+    release.set()
+
+
+def body(response) -> str:
+    async def read():
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+def wait_for_running(admission, n):
+    deadline = time.monotonic() + 2
+    while admission.snapshot()["running"] != n:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_slot_is_released_when_the_body_is_never_read(ask):
+    ask()
+    assert ask.admission.snapshot()["running"] == 1
+    ask.release.set()
+    wait_for_running(ask.admission, 0)
+
+
+def test_identical_questions_share_one_slot(ask):
+    leader, joiner = ask(), ask()
+    assert ask.admission.snapshot()["running"] == 1
+    ask.release.set()
+    assert body(joiner) == "answer"
+    assert body(leader) == "answer"
+    wait_for_running(ask.admission, 0)
+
+
+def test_rejection_is_an_http_error_for_leader_and_joiners(ask):
+    admission = ask.admission
+    admission.acquire("https://ask.test")  # website busy with another question
+    admission.queue_size = admission.per_website_queue = 1
+    admission.max_wait, admission.service_seconds = 0.3, 0.01  # the leader queues, then times out
+    errors = []
+
+    def call():
+        try:
+            ask()
+        except HTTPException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2)
+
+    assert main.ask_flight.coalesced == 2  # the others joined the queued leader
+    assert len(errors) == 3
+    assert all(e.status_code == 503 and "Retry-After" in e.headers for e in errors)
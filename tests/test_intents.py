@@ -0,0 +1,79 @@
+import pytest
+
+from app import menu_index
+from app.intents import classify_intent, route
+
+ROUTING = [
+    ("What are your opening hours?", "hours"),
+    ("What are your hours on Sunday?", "hours"),
+    ("When are you open?", "hours"),
+    ("Are you open on Sunday?", "hours"),
+    ("What time do you close?", "hours"),
+    ("Wann habt ihr geöffnet?", "hours"),
+    ("What is your phone number?", "phone"),
+    ("Whats your number?", "phone"),
+    ("What is your email address?", "email"),
+    ("Where are you located?", "address"),
+    ("Where are you?", "address"),
+    ("Wo seid ihr?", "address"),
+    ("Can I see the menu?", "menu"),
+    ("Kann ich die Karte sehen?", "menu"),
+    ("Puis-je voir la carte ?", "menu"),
+    ("Do you have desserts?", "menu_items"),
+    ("How much is the pizza margherita?", "price"),
+    # weak hints alone must not decide
+    ("Where do your ingredients come from?", None),
+    ("When was the restaurant founded?", None),
+    ("Whats the number of seats?", None),
+    ("How can I contact you about a job?", None),
+    ("Is there a recall on your products?", None),
+    # "hours" as a duration, Karte/carte as a payment card
+    ("How many hours in advance should I book?", None),
+    ("Is parking free for 2 hours?", None),
+    ("Kann ich mit Karte zahlen?", None),
+    ("Acceptez-vous la carte bancaire?", None),
+]
+
+
+@pytest.mark.parametrize("question,expected", ROUTING)
+def test_classify_intent(question, expected):
+    assert classify_intent(question) == expected
+
+
+PROFILE = {
+    "openingHours": ["Mo-Fr 11:00-22:00"],
+    "menuUrls": ["https://example.com/menu.pdf"],
+    "menuItems": [
+        {"section": "Pizza", "name": "Pizza Funghi", "price": "11.50"},
+        {"section": "Pizza", "name": "Pizza Margherita", "price": "9.50"},
+        {"section": "Desserts", "name": "Tiramisu", "price": "6.00"},
+    ],
+}
+
+
+@pytest.fixture
+def website():
+    site = "https://intents.test"
+    yield site
+    menu_index._indexes.pop(site, None)
+
+
+@pytest.mark.parametrize("question,expected", [
+    ("Do you have funghi pizza?", "Yes, we have: Pizza Funghi — 11.50"),
+    ("Do you have tiramisu?", "Yes, we have: Tiramisu — 6.00"),
+    ("What desserts do you have?", "Desserts: Tiramisu — 6.00"),
+    ("How much is the pizza margherita?", "Pizza Margherita costs 9.50"),
+    ("What are your opening hours?", "Opening hours: Mo-Fr 11:00-22:00"),
+])
+def test_route_answers(website, question, expected):
+    assert route(question, website, lambda: PROFILE) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "Do you have parking?",
+    "How many hours in advance should I book?",
+    "Kann ich mit Karte zahlen?",
+    "Acceptez-vous la carte bancaire?",
+])
+def test_route_leaves_other_questions_to_the_llm(website, question):
+    assert route(question, website, lambda: PROFILE) is None
@@ -0,0 +1,30 @@
+import logging
+
+from app.logger import RateLimitFilter
+
+
+def record(msg, *args, level=logging.WARNING):
+    return logging.LogRecord("test", level, __file__, 0, msg, args, None)
+
+
+def test_repeats_of_one_template_are_rate_limited():
+    limit = RateLimitFilter(burst=2, window=60)
+    passed = [limit.filter(record("Chunk upload failed for %d chunks", n)) for n in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limit.suppressed == 3
+    assert limit.filter(record("Another failure: %s", "x"))  # other templates are unaffected
+
+
+def test_the_next_record_after_the_window_reports_suppressed_repeats():
+    limit = RateLimitFilter(burst=1, window=60)
+    limit.filter(record("Fetch failed: %s", "a"))
+    limit.filter(record("Fetch failed: %s", "b"))
+    limit.window = 0  # window over
+    late = record("Fetch failed: %s", "c")
+    assert limit.filter(late)
+    assert late.suppressed == 1
+
+
+def test_info_records_are_never_limited():
+    limit = RateLimitFilter(burst=1, window=60)
+    assert all(limit.filter(record("Indexed %d pages", n, level=logging.INFO)) for n in range(5))
@@ -0,0 +1,241 @@
+import threading
+import time
+
+import pytest
+
+import app.pipeline as pipeline_module
+import app.vectorizer as vectorizer
+import app.website_loader as website_loader
+from app.pipeline import DocLimit, Pipeline, _in_order, index_website
+from app.singleflight import SingleFlight
+
+
+def test_stages_run_in_order_and_count_items():
+    result = []
+
+    def double(items):
+        for x in items:
+            yield x * 2
+
+    def collect(items):
+        for x in items:
+            result.append(x)
+            yield x
+
+    report = Pipeline(range(5)).stage("double", double).stage("collect", collect).run()
+
+    assert result == [0, 2, 4, 6, 8]
+    assert report["stages"]["source"]["items"] == 5
+    assert report["stages"]["collect"]["items"] == 5
+
+
+def test_stage_error_cancels_the_pipeline_and_is_reraised():
+    fetched = []
+
+    def endless():
+        n = 0
+        while True:
+            fetched.append(n)
+            yield n
+            n += 1
+
+    def fail(items):
+        for x in items:
+            if x == 3:
+                raise ValueError("boom")
+            yield x
+
+    start = time.monotonic()
+    with pytest.raises(ValueError):
+        Pipeline(endless(), queue_size=2).stage("fail", fail).stage("sink", lambda items: items).run()
+    assert time.monotonic() - start < 2
+    assert len(fetched) < 20  # the source stopped instead of running on
+
+
+def test_multiple_workers_see_every_item_once():
+    seen = []
+    lock = threading.Lock()
+
+    def record(items):
+        for x in items:
+            with lock:
+                seen.append(x)
+            yield x
+
+    Pipeline(range(100)).stage("record", record, workers=3).stage("sink", lambda items: items).run()
+    assert sorted(seen) == list(range(100))
+
+
+def test_doc_limit_counts_only_docs_that_reach_it():
+    limit = DocLimit(3)
+    fetched = []
+
+    def pages():
+        for n in range(20):
+            fetched.append(n)
+            yield n
+
+    def extract(items):
+        for n in items:
+            if n % 2:  # odd pages extract to nothing
+                limit.drop()
+            else:
+                yield n
+
+    kept = []
+
+    def sink(items):
+        for n in items:
+            kept.append(n)
+            yield n
+
+    pipeline = Pipeline(limit.pages(pages(), lambda: pipeline.cancelled))
+    pipeline.stage("extract", extract).stage("limit", limit.take).stage("sink", sink).run()
+
+    assert kept == [0, 2, 4]
+    assert limit.kept == 3
+    assert len(fetched) <= 6  # never more pages in flight than could still be used
+
+
+def test_doc_limit_source_stops_when_the_pipeline_is_cancelled():
+    limit = DocLimit(1)
+
+    def fail(items):
+        for _ in items:
+            raise ValueError("boom")  # the page is never dropped or kept
+        yield
+
+    pipeline = Pipeline(limit.pages(iter(range(10)), lambda: pipeline.cancelled))
+    pipeline.stage("fail", fail)
+    start = time.monotonic()
+    with pytest.raises(ValueError):
+        pipeline.run()
+    assert time.monotonic() - start < 2
+
+
+@pytest.fixture
+def fake_index(monkeypatch):
+    """index_website over in-memory pages; returns the rows written to Weaviate."""
+    written = []
+    embedded = []
+
+    def embed_shared(texts):
+        embedded.extend(texts)
+        return [[float(len(t))] for t in texts]
+
+    def batch_write(client, class_name, objects, batch_size):
+        written.extend(props for _, props, _ in objects)
+        return []
+
+    monkeypatch.setattr(pipeline_module, "embed_shared", embed_shared)
+    monkeypatch.setattr(pipeline_module, "batch_write", batch_write)
+    monkeypatch.setattr(pipeline_module, "get_client", lambda: None)
+    monkeypatch.setattr(website_loader, "detect_and_store_site_profile", lambda website, addresses: None)
+    monkeypatch.setattr(website_loader, "page_to_doc", lambda page: (
+        {"url": page["url"], "text": page["html"], "title": None, "fetchedAt": None} if page["html"] else None
+    ))
+
+    def run(pages, limit=10):
+        monkeypatch.setattr(website_loader, "iter_pages", lambda website: iter(pages))
+        return index_website("https://pipeline.test", limit=limit)
+
+    run.written = written
+    run.embedded = embedded
+    return run
+
+
+def page(n, text=None):
+    return {"url": f"https://pipeline.test/{n}", "html": f"page {n} text" if text is None else text}
+
+
+def test_index_limit_skips_pages_without_content(fake_index):
+    pages = [page(0), page(1, text=""), page(2), page(3, text=""), page(4), page(5)]
+    report = fake_index(pages, limit=3)
+
+    assert report["pages"] == 3
+    assert sorted(row["source"] for row in fake_index.written) == [
+        "https://pipeline.test/0", "https://pipeline.test/2", "https://pipeline.test/4",
+    ]
+
+
+def test_failed_embed_batch_is_counted_and_indexing_goes_on(fake_index, monkeypatch):
+    calls = []
+
+    def flaky(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("rate limited")
+        return [[1.0] for _ in texts]
+
+    monkeypatch.setattr(pipeline_module, "EMBED_BATCH", 1)
+    monkeypatch.setattr(pipeline_module, "embed_shared", flaky)
+    report = fake_index([page(0), page(1), page(2)])
+
+    assert report["failedChunks"] == {"embed": 1}
+    assert len(fake_index.written) == 2
+
+
+def test_failed_write_is_counted(fake_index, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("weaviate down")
+
+    monkeypatch.setattr(pipeline_module, "batch_write", broken)
+    report = fake_index([page(0), page(1)])
+    assert report["failedChunks"] == {"write": 2}
+
+
+def test_embed_shared_coalesces_concurrent_batches(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        release.wait(2)
+        return [[float(len(t))] for t in texts]
+
+    flight = SingleFlight("embeddings")
+    monkeypatch.setattr(vectorizer, "embed_flight", flight)
+    monkeypatch.setattr(vectorizer, "embed_batch", embed_batch)
+    results = []
+    threads = [
+        threading.Thread(target=lambda texts=texts: results.append(vectorizer.embed_shared(texts)))
+        for texts in (["a", "bb", "a"], ["bb", "ccc"])
+    ]
+    threads[0].start()
+    deadline = time.monotonic() + 2
+    while not calls:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    threads[1].start()
+    deadline = time.monotonic() + 2
+    while flight.coalesced < 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join(2)
+
+    assert calls == [["a", "bb"], ["ccc"]]  # "bb" was embedded once
+    assert sorted(results) == [[[1.0], [2.0], [1.0]], [[2.0], [3.0]]]
+
+
+def test_in_order_resequences_out_of_order_items():
+    assert list(_in_order([(2, "c"), (0, "a"), (3, "d"), (1, "b")])) == ["a", "b", "c", "d"]
+
+
+def test_boilerplate_keeps_the_first_crawled_copy(fake_index, monkeypatch):
+    footer = "Visit us at Main Street 1, open daily from eleven"
+    to_doc = website_loader.page_to_doc
+
+    def slow_page_to_doc(page):
+        if page["url"].endswith("/0"):
+            time.sleep(0.1)  # the other extract worker finishes later pages first
+        return to_doc(page)
+
+    monkeypatch.setattr(website_loader, "page_to_doc", slow_page_to_doc)
+    pages = [page(n, text=f"Unique words for page number {n}\n{footer}") for n in range(8)]
+    pages[1]["html"] = ""  # a page without content still keeps its place
+    fake_index(pages)
+
+    with_footer = [row["source"] for row in fake_index.written if footer in row["text"]]
+    assert with_footer == ["https://pipeline.test/0"]
@@ -0,0 +1,61 @@
+import pytest
+
+import app.weaviate_client as weaviate_client
+from app.cli import main
+
+
+class FakeSchema:
+    def __init__(self, classes=(), fail_on=()):
+        self.classes = [{"class": name} for name in classes]
+        self.fail_on = set(fail_on)
+
+    def get(self):
+        return {"classes": self.classes}
+
+    def create_class(self, cls):
+        if cls["class"] in self.fail_on:
+            raise RuntimeError("schema rejected")
+        self.classes.append(cls)
+
+
+class FakeClient:
+    def __init__(self, schema):
+        self.schema = schema
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    def use(**kwargs):
+        fake = FakeSchema(**kwargs)
+        monkeypatch.setattr(weaviate_client, "get_client", lambda: FakeClient(fake))
+        monkeypatch.setattr(weaviate_client.health, "check", lambda: True)
+        return fake
+
+    return use
+
+
+def test_creates_missing_classes(schema):
+    fake = schema()
+    assert weaviate_client.ensure_webcontent_schema() is True
+    assert {c["class"] for c in fake.classes} == {"WebContent", "BusinessProfile", "CustomQA"}
+    assert main(["ensure-schema"]) == 0
+
+
+def test_failed_create_is_reported(schema):
+    schema(fail_on={"CustomQA"})
+    assert weaviate_client.ensure_webcontent_schema() is False
+
+
+def test_cli_exits_non_zero_when_a_class_cannot_be_created(schema):
+    schema(fail_on={"WebContent"})
+    assert main(["ensure-schema"]) == 1
+
+
+def test_cli_exits_non_zero_when_the_schema_cannot_be_read(schema, monkeypatch):
+    schema()
+
+    def unreachable():
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(weaviate_client, "get_client", unreachable)
+    assert main(["ensure-schema"]) == 1
@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+
+from app.singleflight import SingleFlight, normalize_question
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_threads(n, target):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def test_normalize_question():
+    assert normalize_question("  What  are your HOURS?! ") == "what are your hours"
+
+
+def test_do_shares_one_call_among_concurrent_callers():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return "result"
+
+    threads, results, errors = run_threads(5, lambda: flight.do("k", work))
+    wait_until(lambda: "k" in flight._calls and flight._calls["k"].waiters == 4)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["result"] * 5 and not errors
+    assert len(calls) == 1
+    assert flight.coalesced == 4
+    assert flight._calls == {}
+
+
+def test_do_shares_the_leaders_error():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def work():
+        release.wait(2)
+        raise ValueError("boom")
+
+    threads, results, errors = run_threads(3, lambda: flight.do("k", work))
+    wait_until(lambda: "k" in flight._calls and flight._calls["k"].waiters == 2)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert not results
+    assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+    # the failed call is not cached: the next caller runs again
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_do_runs_different_keys_independently():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.coalesced == 0
+
+
+def test_stream_joiners_replay_earlier_chunks():
+    flight = SingleFlight("test")
+    step = threading.Event()
+
+    def source():
+        yield "a"
+        step.wait(2)
+        yield "b"
+
+    leader = flight.stream("k", source)
+    assert next(leader) == "a"
+    joiner = flight.stream("k", lambda: pytest.fail("joiner must not start a second source"))
+    step.set()
+
+    assert list(leader) == ["b"]
+    assert list(joiner) == ["a", "b"]
+    assert flight.coalesced == 1
+    wait_until(lambda: flight._streams == {})
+
+
+def test_stream_is_drained_when_no_one_reads():
+    flight = SingleFlight("test")
+    drained = threading.Event()
+
+    def source():
+        yield "a"
+        drained.set()
+
+    flight.stream("k", source)  # reader dropped, like a disconnected client
+    assert drained.wait(2)
+    wait_until(lambda: flight._streams == {})
+
+
+def test_stream_error_reaches_readers():
+    flight = SingleFlight("test")
+
+    def source():
+        yield "a"
+        raise ValueError("boom")
+
+    reader = flight.stream("k", source)
+    assert next(reader) == "a"
+    with pytest.raises(ValueError):
+        next(reader)
+
+
+def test_stream_joiners_wait_for_the_leader_to_start():
+    flight = SingleFlight("test")
+    admitted = threading.Event()
+
+    def start():
+        admitted.wait(2)  # e.g. waiting for an admission slot
+        return iter(["a"])
+
+    leader = threading.Thread(target=lambda: flight.stream("k", start))
+    leader.start()
+    wait_until(lambda: "k" in flight._streams)
+    joiner = threading.Thread(target=lambda: flight.stream("k", start))
+    joiner.start()
+    time.sleep(0.05)
+    assert joiner.is_alive()
+    admitted.set()
+    joiner.join(2)
+    leader.join(2)
+    assert not joiner.is_alive()
+
+
+def test_stream_leader_start_error_is_raised_to_joiners():
+    flight = SingleFlight("test")
+    rejected = threading.Event()
+
+    def start():
+        rejected.wait(2)
+        raise ValueError("rejected")
+
+    threads, results, errors = run_threads(3, lambda: flight.stream("k", start))
+    wait_until(lambda: flight.coalesced == 2)
+    rejected.set()
+    for t in threads:
+        t.join()
+
+    assert not results
+    assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+    assert flight._streams == {}
+
+
+def test_do_batch_leads_new_keys_and_shares_errors():
+    flight = SingleFlight("test")
+    assert flight.do_batch(["a", "b", "a"], lambda keys: [k.upper() for k in keys]) == ["A", "B", "A"]
+
+    release = threading.Event()
+
+    def fail(keys):
+        release.wait(2)
+        raise ValueError("boom")
+
+    threads, results, errors = run_threads(1, lambda: flight.do_batch(["x", "y"], fail))
+    wait_until(lambda: "y" in flight._calls)
+    joiner_threads, _, joiner_errors = run_threads(1, lambda: flight.do_batch(["y", "z"], lambda keys: ["Z"]))
+    wait_until(lambda: flight.coalesced == 1)
+    release.set()
+    for t in threads + joiner_threads:
+        t.join()
+
+    assert isinstance(errors[0], ValueError) and isinstance(joiner_errors[0], ValueError)
+    assert flight._calls == {}
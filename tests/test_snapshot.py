@@ -0,0 +1,151 @@
+import pytest
+
+import app.snapshot as snapshot
+
+PROPERTIES = {
+    "WebContent": ["text", "website"],
+    "CustomQA": ["question", "answer", "website"],
+    "BusinessProfile": ["name", "website"],
+}
+
+
+class FakeQuery:
+    def __init__(self, store, class_name, properties):
+        self.store = store
+        self.class_name = class_name
+        self.properties = properties
+        self.additional = []
+        self.limit = None
+        self.after = None
+        self.where = None
+
+    def with_additional(self, additional):
+        self.additional = additional
+        return self
+
+    def with_limit(self, limit):
+        self.limit = limit
+        return self
+
+    def with_after(self, after):
+        self.after = after
+        return self
+
+    def with_where(self, where):
+        self.where = where
+        return self
+
+    def with_offset(self, offset):
+        raise AssertionError("offset paging is capped at QUERY_MAXIMUM_RESULTS")
+
+    def do(self):
+        objects = sorted(self.store[self.class_name], key=lambda o: o["id"])  # cursor order
+        if self.after:
+            objects = [o for o in objects if o["id"] > self.after]
+        if self.where:
+            assert self.where["path"] == ["id"] and self.where["operator"] == "ContainsAny"
+            objects = [o for o in objects if o["id"] in self.where["valueTextArray"]]
+        rows = []
+        for o in objects[:self.limit]:
+            row = {p: o["props"].get(p) for p in self.properties}
+            row["_additional"] = {"id": o["id"]}
+            if "vector" in self.additional:
+                row["_additional"]["vector"] = o["vector"]
+            rows.append(row)
+        return {"data": {"Get": {self.class_name: rows}}}
+
+
+class FakeClient:
+    def __init__(self, store):
+        client = self
+
+        class Schema:
+            def get(self, class_name):
+                return {"properties": [{"name": p} for p in PROPERTIES[class_name]]}
+
+        class Query:
+            def get(self, class_name, properties):
+                return FakeQuery(client.store, class_name, properties)
+
+        self.store = store
+        self.schema = Schema()
+        self.query = Query()
+
+
+def make_store(per_site=7):
+    store = {name: [] for name in PROPERTIES}
+    n = 0
+    for site in ("https://a.test", "https://b.test"):
+        for i in range(per_site):
+            n += 1
+            store["WebContent"].append({
+                "id": f"{n:08d}-0000-0000-0000-000000000000",
+                "props": {"text": f"{site} chunk {i}", "website": site},
+                "vector": [float(n), float(i), 0.5],
+            })
+        store["BusinessProfile"].append({
+            "id": f"{n:08d}-0000-0000-0000-00000000000b", "props": {"name": site, "website": site}, "vector": None,
+        })
+    return store
+
+
+@pytest.fixture
+def weaviate(monkeypatch):
+    store = make_store()
+    client = FakeClient(store)
+    monkeypatch.setattr(snapshot, "PAGE_SIZE", 3)  # several cursor pages per class
+    monkeypatch.setattr(snapshot, "get_client", lambda: client)
+    monkeypatch.setattr(snapshot, "ensure_webcontent_schema", lambda: True)
+    monkeypatch.setattr(snapshot, "configured_dimensions", lambda: 3)
+    monkeypatch.setattr(snapshot, "stored_dimensions", lambda client, class_name: 3)
+    return store
+
+
+def test_export_pages_with_the_cursor_and_keeps_one_website(weaviate, tmp_path):
+    path = tmp_path / "a.snap"
+    counts = snapshot.export_site("https://a.test", path)
+    assert counts == {"WebContent": 7, "CustomQA": 0, "BusinessProfile": 1}
+
+    with snapshot.Snapshot(path) as snap:
+        rows = list(snap.objects("WebContent"))
+    expected = [o for o in weaviate["WebContent"] if o["props"]["website"] == "https://a.test"]
+    assert [(uuid, vector) for uuid, _, vector in rows] == [(o["id"], o["vector"]) for o in expected]
+    assert all(props["website"] == "https://a.test" for _, props, _ in rows)
+
+
+def test_import_restores_every_object(weaviate, tmp_path, monkeypatch):
+    path = tmp_path / "a.snap"
+    snapshot.export_site("https://a.test", path)
+    written = {}
+
+    def batch_write(client, class_name, objects, batch_size):
+        written[class_name] = list(objects)
+        return []
+
+    monkeypatch.setattr(snapshot, "batch_write", batch_write)
+    report = snapshot.import_site(path)
+
+    assert report["classes"]["WebContent"] == {"objects": 7, "failed": 0}
+    assert len(written["WebContent"]) == 7
+    assert written["BusinessProfile"][0][2] is None
+
+
+def test_failed_import_raises_the_write_error(weaviate, tmp_path, monkeypatch):
+    path = tmp_path / "a.snap"
+    snapshot.export_site("https://a.test", path)
+
+    def batch_write(client, class_name, objects, batch_size):
+        next(objects)  # part-way through the vector block
+        raise ConnectionError("weaviate went away")
+
+    monkeypatch.setattr(snapshot, "batch_write", batch_write)
+    with pytest.raises(ConnectionError):
+        snapshot.import_site(path)
+
+
+def test_import_refuses_a_different_vector_size(weaviate, tmp_path, monkeypatch):
+    path = tmp_path / "a.snap"
+    snapshot.export_site("https://a.test", path)
+    monkeypatch.setattr(snapshot, "configured_dimensions", lambda: 1536)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.import_site(path)